@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import os,sys
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+import argparse
+
+from multiagent import benchmark
+
+if __name__ == '__main__':
+    # parse arguments
+    parser = argparse.ArgumentParser(description='Measure steps/sec of the bundled scenarios with random actions.')
+    parser.add_argument('-s', '--scenario', nargs='*', default=None, help='Scenario names (default: all).')
+    parser.add_argument('--steps', type=int, default=1000, help='Steps per scenario.')
+    parser.add_argument('--episode-len', type=int, default=25, help='Steps between resets.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--world-arg', action='append', default=[], metavar='SCENARIO:NAME=VALUE',
+                        help='make_world argument for a scenario, e.g. maze_push:mode=1 (required ones default to 0); '
+                             'with --sweep, stress:NAME=VALUE arguments apply to the stress worlds.')
+    parser.add_argument('--baseline', help='JSON results to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed fraction of slowdown vs. the baseline.')
+    parser.add_argument('--save', help='Write the results as JSON (e.g. to use as a baseline).')
+    parser.add_argument('--sweep', type=int, nargs='+', metavar='N',
+                        help='Instead, time each step component of stress worlds with N entities.')
+    parser.add_argument('--plot', help='With --sweep, plot step time against N to this image file.')
+    args = parser.parse_args()
+
+    kwargs = {}
+    for arg in args.world_arg:
+        name, assignment = arg.split(':', 1)
+        key, value = assignment.split('=', 1)
+        kwargs.setdefault(name, {})[key] = int(value) if value.lstrip('-').isdigit() else value
+
+    if args.sweep:
+        results = benchmark.scaling_sweep(args.sweep, steps=args.steps, seed=args.seed, kwargs=kwargs.get('stress'))
+        print(benchmark.format_sweep(results))
+        if args.save:
+            benchmark.save(results, args.save)
+        if args.plot:
+            try:
+                benchmark.plot_sweep(results, args.plot)
+            except ImportError:
+                print('plotting needs matplotlib')
+        sys.exit(0)
+
+    names = [os.path.splitext(os.path.basename(name))[0] for name in args.scenario] if args.scenario else None
+    results = benchmark.run(names, steps=args.steps, episode_len=args.episode_len, seed=args.seed, kwargs=kwargs)
+    baseline = benchmark.load(args.baseline) if args.baseline else None
+    print(benchmark.format_results(results, baseline))
+    if args.save:
+        benchmark.save(results, args.save)
+    if baseline is not None:
+        slower = benchmark.regressions(results, baseline, args.tolerance)
+        for name, (before, after) in sorted(slower.items()):
+            print('regression: %s %.0f -> %.0f steps/s' % (name, before, after))
+        if slower:
+            sys.exit(1)
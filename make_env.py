@@ -12,7 +12,7 @@ of size (env.world.dim_p + env.world.dim_c, 1). Physical actions precede
 communication actions in this array. See environment.py for more details.
 """
 
-def make_env(scenario_name, benchmark=False):
+def make_env(scenario_name, benchmark=False, **kwargs):
     '''
     Creates a MultiAgentEnv object as env. This can be used similar to a gym
     environment by calling env.reset() and env.step().
@@ -23,6 +23,7 @@ def make_env(scenario_name, benchmark=False):
                             (without the .py extension)
         benchmark       :   whether you want to produce benchmarking data
                             (usually only done during evaluation)
+        kwargs          :   passed on to the scenario's make_world (e.g. mode)
 
     Some useful env properties (see environment.py):
         .observation_space  :   Returns the observation space for each agent
@@ -30,15 +31,47 @@ def make_env(scenario_name, benchmark=False):
         .n                  :   Returns the number of Agents
     '''
     from multiagent.environment import MultiAgentEnv
+    from multiagent.scenario import scenario_hooks
     import multiagent.scenarios as scenarios
 
     # load scenario from script
     scenario = scenarios.load(scenario_name + ".py").Scenario()
     # create world
-    world = scenario.make_world()
+    world = scenario.make_world(**kwargs)
     # create multiagent environment
+    hooks = scenario_hooks(scenario)
     if benchmark:        
-        env = MultiAgentEnv(world, scenario.reset_world, scenario.reward, scenario.observation, scenario.benchmark_data)
+        env = MultiAgentEnv(world, scenario.reset_world, scenario.reward, scenario.observation, scenario.benchmark_data, **hooks)
     else:
-        env = MultiAgentEnv(world, scenario.reset_world, scenario.reward, scenario.observation)
+        env = MultiAgentEnv(world, scenario.reset_world, scenario.reward, scenario.observation, **hooks)
     return env
+
+
+def make_batch_env(scenario_name, num_envs, max_episode_len=None, seed=None, **kwargs):
+    '''
+    Creates a BatchWorldEnv that steps num_envs copies of a scenario together
+    in this process, using the scenario's batched callbacks (batch_reset,
+    batch_observation, batch_reward, batch_done) where it defines them, and
+    its per-world callbacks (including done) otherwise.
+
+    Input:
+        scenario_name   :   name of the scenario from ./scenarios/
+        num_envs        :   number of environments in the batch
+        max_episode_len :   steps after which an environment is reset
+        seed            :   seed of the batch's random streams
+        kwargs          :   passed on to the scenario's make_world
+    '''
+    from multiagent.environment import MultiAgentEnv
+    from multiagent.scenario import scenario_hooks
+    from multiagent.vec_env import BatchWorldEnv
+    import multiagent.scenarios as scenarios
+
+    scenario = scenarios.load(scenario_name + ".py").Scenario()
+    world = scenario.make_world(**kwargs)
+    env = MultiAgentEnv(world, scenario.reset_world, scenario.reward, scenario.observation,
+                        done_callback=getattr(scenario, 'done', None), **scenario_hooks(scenario))
+    return BatchWorldEnv(env, num_envs,
+                         batch_reset_callback=getattr(scenario, 'batch_reset', None),
+                         batch_observation_callback=getattr(scenario, 'batch_observation', None),
+                         batch_done_callback=getattr(scenario, 'batch_done', None),
+                         max_episode_len=max_episode_len, seed=seed)
@@ -0,0 +1,192 @@
+import glob
+import inspect
+import json
+import os.path as osp
+import time
+import tracemalloc
+
+import gym.spaces as spaces
+import numpy as np
+
+from multiagent.environment import MultiAgentEnv
+from multiagent.multi_discrete import MultiDiscrete
+from multiagent.scenario import scenario_hooks
+import multiagent.scenarios as scenarios
+
+
+# names of all bundled scenarios
+def scenario_names():
+    files = glob.glob(osp.join(osp.dirname(scenarios.__file__), '*.py'))
+    return sorted(osp.splitext(osp.basename(f))[0] for f in files if not osp.basename(f).startswith('_'))
+
+
+# arguments for make_world: the given ones, plus 0 for any required argument
+# (such as mode) that has no default
+def world_kwargs(scenario, kwargs=None):
+    kwargs = dict(kwargs or {})
+    for name, param in inspect.signature(scenario.make_world).parameters.items():
+        if param.default is param.empty and name not in kwargs:
+            kwargs[name] = 0
+    return kwargs
+
+
+def make_benchmark_env(name, kwargs=None):
+    scenario = scenarios.load(name + '.py').Scenario()
+    world = scenario.make_world(**world_kwargs(scenario, kwargs))
+    return MultiAgentEnv(world, scenario.reset_world, scenario.reward, scenario.observation, **scenario_hooks(scenario))
+
+
+# random action for an action space
+def sample_action(space, rng):
+    if isinstance(space, MultiDiscrete):
+        return np.concatenate([np.eye(high - low + 1)[rng.randint(high - low + 1)]
+                               for low, high in zip(space.low, space.high)])
+    if isinstance(space, spaces.Discrete):
+        return np.eye(space.n)[rng.randint(space.n)]
+    if isinstance(space, spaces.Tuple):
+        return tuple(sample_action(s, rng) for s in space.spaces)
+    return rng.uniform(space.low, space.high)
+
+
+# random-action rollouts of one env with resets every episode_len steps
+def rollout(env, steps, episode_len, rng):
+    reset_time = 0.0
+    resets = 0
+    step_time = 0.0
+    for t in range(steps):
+        if t % episode_len == 0:
+            start = time.perf_counter()
+            env.reset()
+            reset_time += time.perf_counter() - start
+            resets += 1
+        action_n = [sample_action(space, rng) for space in env.action_space]
+        start = time.perf_counter()
+        env.step(action_n)
+        step_time += time.perf_counter() - start
+    return step_time, reset_time / max(resets, 1)
+
+
+# time fixed-seed random-action rollouts of a scenario: steps per second,
+# agent-steps per second, mean reset latency and peak memory allocated while
+# running one episode
+def benchmark_scenario(name, steps=1000, episode_len=25, seed=0, kwargs=None):
+    env = make_benchmark_env(name, kwargs)
+    env.seed(seed)
+    step_time, reset_latency = rollout(env, steps, episode_len, np.random.RandomState(seed))
+    # memory is measured separately as tracing slows everything down
+    tracemalloc.start()
+    try:
+        rollout(env, episode_len, episode_len, np.random.RandomState(seed))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'agents': env.n,
+            'steps_per_sec': steps / step_time,
+            'agent_steps_per_sec': steps * env.n / step_time,
+            'reset_latency': reset_latency,
+            'peak_memory': peak}
+
+
+# benchmark several scenarios (all by default); scenarios that fail are
+# reported with their error. kwargs maps scenario names to make_world arguments
+def run(names=None, steps=1000, episode_len=25, seed=0, kwargs=None):
+    results = {}
+    for name in scenario_names() if names is None else names:
+        try:
+            results[name] = benchmark_scenario(name, steps, episode_len, seed, (kwargs or {}).get(name))
+        except Exception as e:
+            results[name] = {'error': '%s: %s' % (type(e).__name__, e)}
+    return results
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# scenarios whose steps/sec dropped by more than tolerance (a fraction)
+# relative to the baseline, as {name: (baseline, current)}
+def regressions(results, baseline, tolerance=0.2):
+    slower = {}
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        if 'steps_per_sec' not in result or 'steps_per_sec' not in base:
+            continue
+        if result['steps_per_sec'] < base['steps_per_sec'] * (1 - tolerance):
+            slower[name] = (base['steps_per_sec'], result['steps_per_sec'])
+    return slower
+
+
+# table of results, with the change in steps/sec if a baseline is given
+def format_results(results, baseline=None):
+    lines = ['%-28s %6s %12s %14s %10s %10s %8s' % (
+        'scenario', 'agents', 'steps/s', 'agent-steps/s', 'reset ms', 'peak kB', 'change')]
+    for name, result in sorted(results.items()):
+        if 'error' in result:
+            lines.append('%-28s failed: %s' % (name, result['error']))
+            continue
+        change = ''
+        base = (baseline or {}).get(name, {})
+        if 'steps_per_sec' in base:
+            change = '%+.0f%%' % (100 * (result['steps_per_sec'] / base['steps_per_sec'] - 1))
+        lines.append('%-28s %6d %12.0f %14.0f %10.3f %10.0f %8s' % (
+            name, result['agents'], result['steps_per_sec'], result['agent_steps_per_sec'],
+            result['reset_latency'] * 1e3, result['peak_memory'] / 1024, change))
+    return '\n'.join(lines)
+
+
+# step time per component for stress worlds (scenarios/stress.py) of growing
+# size: each size in sizes is split evenly between agents, movable landmarks,
+# static landmarks and border blocks (sizes below 4 get one of each but borders);
+# kwargs are further make_world arguments. Returns {size: {phase: seconds per
+# step}} from the profiler, plus 'step' for the whole env step
+def scaling_sweep(sizes, steps=100, seed=0, kwargs=None):
+    results = {}
+    for size in sizes:
+        n = max(size // 4, 1)
+        world_args = dict(num_agents=n, num_movable=n, num_static=n, num_borders=max(0, size - 3 * n))
+        world_args.update(kwargs or {})
+        env = make_benchmark_env('stress', world_args)
+        env.seed(seed)
+        env.reset()
+        rng = np.random.RandomState(seed)
+        profiler = env.enable_profiling()
+        for t in range(steps):
+            env.step([sample_action(space, rng) for space in env.action_space])
+        env.disable_profiling()
+        stats = profiler.stats()
+        results[size] = {name: s['total'] / steps for name, s in stats.items()}
+        results[size]['step'] = results[size].pop('env_step')
+    return results
+
+
+# table of a scaling sweep in milliseconds per step
+def format_sweep(results):
+    phases = sorted({name for times in results.values() for name in times},
+                    key=lambda name: -max(times.get(name, 0.0) for times in results.values()))
+    lines = ['%8s' % 'entities' + ''.join(' %14s' % name for name in phases)]
+    for size in sorted(results):
+        lines.append('%8d' % size + ''.join(' %14.3f' % (results[size].get(name, 0.0) * 1e3) for name in phases))
+    return '\n'.join(lines)
+
+
+# log-log plot of step time per component against the number of entities
+# (needs matplotlib)
+def plot_sweep(results, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    sizes = sorted(results)
+    fig, ax = plt.subplots()
+    for name in sorted({name for times in results.values() for name in times}):
+        ax.loglog(sizes, [results[size].get(name, np.nan) * 1e3 for size in sizes], marker='o', label=name)
+    ax.set_xlabel('entities')
+    ax.set_ylabel('ms per step')
+    ax.legend(fontsize='small')
+    fig.savefig(path)
+    plt.close(fig)
@@ -1,14 +1,68 @@
+import itertools
+import math
 import numpy as np
 
+# entity roles, stored as integer codes in the world arrays
+AGENT, LANDMARK, BOX, TARGET, BORDER, GOAL = range(6)
+ROLES = (AGENT, LANDMARK, BOX, TARGET, BORDER, GOAL)
+
 
 # physical/external base state of all entites
 class EntityState(object):
     def __init__(self):
+        # world state arrays this state is bound to (None while unbound)
+        self._world_state = None
+        self._index = None
         # physical position
         self.p_pos = None
         # physical velocity
         self.p_vel = None
 
+    # once bound, p_pos and p_vel are views into the world arrays, so reading
+    # them is a plain attribute lookup; assigning them writes into the arrays
+    def __setattr__(self, name, value):
+        if name in BOUND_STATE and self._world_state is not None:
+            getattr(self._world_state, name)[self._index] = value
+            return
+        object.__setattr__(self, name, value)
+
+    # views are left out of copies and pickles and recreated once both this
+    # state and its world arrays are restored (see WorldState.__setstate__).
+    # Attributes are restored one by one rather than through __dict__, which
+    # would make every later attribute lookup slower
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if state['_world_state'] is not None:
+            for name in BOUND_STATE:
+                state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        world_state = self._world_state
+        if world_state is not None and hasattr(world_state, 'p_pos'):
+            self.bind(world_state, self._index)
+
+    def bind(self, world_state, index):
+        self._world_state = world_state
+        self._index = index
+        for name in BOUND_STATE:
+            object.__setattr__(self, name, getattr(world_state, name)[index])
+
+    def unbind(self):
+        # keep a private copy of the state when leaving the world arrays
+        if self._world_state is None:
+            return
+        p_pos, p_vel = self.p_pos.copy(), self.p_vel.copy()
+        self._world_state = None
+        self._index = None
+        self.p_pos, self.p_vel = p_pos, p_vel
+
+
+# entity state attributes that live in the world arrays once bound
+BOUND_STATE = ('p_pos', 'p_vel')
+
 
 # state of agents (including communication and internal/mental state)
 class AgentState(EntityState):
@@ -27,11 +81,39 @@ class Action(object):
         self.c = None
 
 
+# constraint letting an entity move only while at least k of the given agents
+# are in contact with it (pushing it with at least World.contact_threshold of
+# force); agents defaults to all agents of the world and k to all of agents.
+# Movable boxes without a constraint of their own get the default one
+class PushConstraint(object):
+    def __init__(self, k=None, agents=None):
+        self.k = k
+        self.agents = agents
+
+
+def infer_role(entity):
+    if isinstance(entity, Agent):
+        return AGENT
+    if isinstance(entity, Border) or "border" in entity.name:
+        return BORDER
+    if isinstance(entity, Goal) or "goal" in entity.name:
+        return GOAL
+    if "box" in entity.name:
+        return BOX
+    if "target" in entity.name:
+        return TARGET
+    return LANDMARK
+
+
 # properties and state of physical world entity
 class Entity(object):
     def __init__(self):
         # name 
         self.name = ''
+        # role code (None to infer it, see role)
+        self.role = None
+        # PushConstraint limiting when the entity can move (None for none)
+        self.push_constraint = None
         # properties:
         self.size = 0.050
         # entity can move / be pushed
@@ -50,11 +132,296 @@ class Entity(object):
         # mass
         self.initial_mass = 1.0
 
+    # entity properties are plain attributes; once the entity is bound to the
+    # world arrays (see WORLD_PROPERTIES), assigning them updates the arrays.
+    # Renaming it updates its role too, which may be inferred from the name
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in WORLD_PROPERTIES or name == 'name':
+            state = getattr(self, 'state', None)
+            if state is not None and state._world_state is not None:
+                state._world_state.set_property(state._index, self, 'role' if name == 'name' else name)
+
+    # role of the entity (one of ROLES); unless set explicitly, it follows from
+    # the entity's class and, for landmarks, from its name ("box", "target", ...)
+    @property
+    def role(self):
+        return infer_role(self) if self._role is None else self._role
+
+    @role.setter
+    def role(self, role):
+        self._role = role
+
     @property
     def mass(self):
         return self.initial_mass
 
 
+# entity attributes mirrored into the world arrays once bound, as
+# {attribute: (array name, value stored in place of None)}
+WORLD_PROPERTIES = {
+    'size': ('size', None),
+    'movable': ('movable', None),
+    'collide': ('collide', None),
+    'max_speed': ('max_speed', np.inf),
+    'initial_mass': ('mass', None),
+    'role': ('role', None),
+    'push_constraint': ('push_constraint', None),
+    'u_noise': ('u_noise', 0.0),
+    'c_noise': ('c_noise', 0.0),
+}
+
+
+# value of an entity property as stored in the world arrays
+def array_value(entity, name):
+    value = getattr(entity, name)
+    return WORLD_PROPERTIES[name][1] if value is None else value
+
+
+# contiguous (structure-of-arrays) physical state of all entities in a world
+class WorldState(object):
+    def __init__(self, entities, dim_p):
+        n = len(entities)
+        self.entities = list(entities)
+        # physical state
+        self.p_pos = np.zeros((n, dim_p))
+        self.p_vel = np.zeros((n, dim_p))
+        # physical properties
+        self.size = np.zeros(n)
+        self.mass = np.ones(n)
+        self.movable = np.zeros(n, dtype=bool)
+        self.collide = np.zeros(n, dtype=bool)
+        self.max_speed = np.full(n, np.inf)
+        # agent motor/communication noise amounts (zero for other entities)
+        self.u_noise = np.zeros(n)
+        self.c_noise = np.zeros(n)
+        # role codes
+        self.role = np.array([entity.role for entity in self.entities], dtype=int)
+        # push constraints (see PushConstraint)
+        self.push_constraint = np.empty(n, dtype=object)
+        # force buffer reused by every step
+        self.p_force = np.zeros((n, dim_p))
+        # sleeping bodies (see World.sleeping): whether each entity is asleep,
+        # for how many steps it has been at rest, and where it fell asleep
+        self.asleep = np.zeros(n, dtype=bool)
+        self.rest_steps = np.zeros(n, dtype=int)
+        self.sleep_pos = np.zeros((n, dim_p))
+        # copy the current values in before the entities start pointing here
+        for i, entity in enumerate(self.entities):
+            if entity.state.p_pos is not None:
+                self.p_pos[i] = entity.state.p_pos
+            if entity.state.p_vel is not None:
+                self.p_vel[i] = entity.state.p_vel
+            self.size[i] = entity.size
+            self.mass[i] = entity.mass
+            self.movable[i] = entity.movable
+            self.collide[i] = entity.collide
+            self.max_speed[i] = array_value(entity, 'max_speed')
+            self.push_constraint[i] = entity.push_constraint
+            if isinstance(entity, Agent):
+                self.u_noise[i] = array_value(entity, 'u_noise')
+                self.c_noise[i] = array_value(entity, 'c_noise')
+        for i, entity in enumerate(self.entities):
+            entity.state.bind(self, i)
+        self.layout_version = 0
+        self.invalidate()
+
+    # rebind the entity states restored before these arrays (the others bind
+    # themselves, see EntityState.__setstate__)
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        for i, entity in enumerate(self.entities):
+            entity_state = getattr(entity, 'state', None)
+            if entity_state is not None and hasattr(entity_state, '_index'):
+                entity_state.bind(self, i)
+
+    # mirror a changed entity property (see WORLD_PROPERTIES) into the arrays
+    def set_property(self, i, entity, name):
+        getattr(self, WORLD_PROPERTIES[name][0])[i] = array_value(entity, name)
+        self.invalidate()
+
+    # drop index arrays derived from the entity properties
+    def invalidate(self):
+        self.layout_version += 1
+        self._movable_index = None
+        self._collider_index = None
+        self._collider_view = None
+        self._collider_movable = None
+        self._movable_collider_index = None
+        self._free_mask = None
+        self._free_index = None
+        self._speed_limited = None
+        self._u_noisy = None
+        self._c_noisy = None
+        self._pushed_index = None
+        self._pushers = None
+        self._min_pushers = None
+        self._role_index = None
+
+    # indices of the entities of each role, as {role: index array}
+    @property
+    def role_index(self):
+        if self._role_index is None:
+            self._role_index = {role: np.flatnonzero(self.role == role) for role in ROLES}
+        return self._role_index
+
+    # indices of movable entities
+    @property
+    def movable_index(self):
+        if self._movable_index is None:
+            self._movable_index = np.flatnonzero(self.movable)
+        return self._movable_index
+
+    # indices of colliding entities
+    @property
+    def collider_index(self):
+        if self._collider_index is None:
+            self._collider_index = np.flatnonzero(self.collide)
+        return self._collider_index
+
+    # colliding entities as an index that is a slice when they are contiguous
+    # (e.g. just the agents), so that it indexes views
+    @property
+    def collider_view(self):
+        if self._collider_view is None:
+            self._collider_view = contiguous_index(self.collider_index)
+        return self._collider_view
+
+    # mask of the movable entities among the colliding ones (None if all are)
+    @property
+    def collider_movable(self):
+        if self._collider_movable is None:
+            movable = self.movable[self.collider_index]
+            self._collider_movable = False if movable.all() else movable
+        return None if self._collider_movable is False else self._collider_movable
+
+    # indices of movable colliding entities, a slice when contiguous
+    @property
+    def movable_collider_index(self):
+        if self._movable_collider_index is None:
+            self._movable_collider_index = contiguous_index(np.flatnonzero(self.movable & self.collide))
+        return self._movable_collider_index
+
+    # mask of movable entities without a push constraint
+    @property
+    def free_mask(self):
+        if self._free_mask is None:
+            self._free_mask = self.movable.copy()
+            self._free_mask[self.pushed_index] = False
+        return self._free_mask
+
+    # indices of movable entities without a push constraint, as a slice when
+    # they are contiguous (e.g. just the agents) so that they index views
+    @property
+    def free_index(self):
+        if self._free_index is None:
+            self._free_index = contiguous_index(np.flatnonzero(self.free_mask))
+        return self._free_index
+
+    # whether any agent has motor noise
+    @property
+    def u_noisy(self):
+        if self._u_noisy is None:
+            self._u_noisy = bool(self.u_noise.any())
+        return self._u_noisy
+
+    # whether any agent has communication noise
+    @property
+    def c_noisy(self):
+        if self._c_noisy is None:
+            self._c_noisy = bool(self.c_noise.any())
+        return self._c_noisy
+
+    # whether any entity has a max speed
+    @property
+    def speed_limited(self):
+        if self._speed_limited is None:
+            self._speed_limited = bool(np.isfinite(self.max_speed).any())
+        return self._speed_limited
+
+    # indices of movable entities with a push constraint
+    @property
+    def pushed_index(self):
+        if self._pushed_index is None:
+            self.build_push_constraints()
+        return self._pushed_index
+
+    # (n_agents, len(pushed_index)) mask of the agents that count towards each
+    # push constraint
+    @property
+    def pushers(self):
+        if self._pushers is None:
+            self.build_push_constraints()
+        return self._pushers
+
+    # number of agents that must push each constrained entity for it to move
+    @property
+    def min_pushers(self):
+        if self._min_pushers is None:
+            self.build_push_constraints()
+        return self._min_pushers
+
+    def build_push_constraints(self):
+        agents = [entity for entity in self.entities if isinstance(entity, Agent)]
+        index, pushers, min_pushers = [], [], []
+        for i, constraint in enumerate(self.push_constraint):
+            if constraint is None and self.role[i] == BOX:
+                constraint = PushConstraint()
+            if constraint is None or not self.movable[i]:
+                continue
+            if constraint.agents is None:
+                mask = np.ones(len(agents), dtype=bool)
+            else:
+                mask = np.array([any(agent is a for a in constraint.agents) for agent in agents], dtype=bool)
+            index.append(i)
+            pushers.append(mask)
+            min_pushers.append(np.count_nonzero(mask) if constraint.k is None else constraint.k)
+        self._pushed_index = np.array(index, dtype=int)
+        self._pushers = np.array(pushers, dtype=bool).reshape(len(index), len(agents)).T
+        self._min_pushers = np.array(min_pushers, dtype=int)
+
+    def release(self, keep=()):
+        # detach entities that are no longer part of the world
+        keep = set(id(entity) for entity in keep)
+        for entity in self.entities:
+            if id(entity) not in keep and entity.state._world_state is self:
+                entity.state.unbind()
+
+
+# pairwise geometry of all entities at one step, shared by the scenario
+# callbacks (see World.contacts). Arrays returned from here must not be modified
+class Contacts(object):
+    def __init__(self, state):
+        delta_pos = state.p_pos[:, None, :] - state.p_pos[None, :, :]
+        # distance between entity centers
+        self.distances = np.sqrt(squared_norm(delta_pos))
+        # entities closer than the sum of their sizes (an entity overlaps itself)
+        self.overlaps = self.distances < state.size[:, None] + state.size[None, :]
+
+    def distance(self, entity_a, entity_b):
+        return self.distances[entity_a.state._index, entity_b.state._index]
+
+    def overlap(self, entity_a, entity_b):
+        return bool(self.overlaps[entity_a.state._index, entity_b.state._index])
+
+    # distances between each of entities_a and each of entities_b
+    def distances_between(self, entities_a, entities_b):
+        return self.distances[self.index(entities_a)][:, self.index(entities_b)]
+
+    # overlaps between each of entities_a and each of entities_b
+    def overlaps_between(self, entities_a, entities_b):
+        return self.overlaps[self.index(entities_a)][:, self.index(entities_b)]
+
+    # rows of the given entities, as a slice when they are consecutive (such
+    # as world.agents or world.landmarks) so that lookups are views
+    def index(self, entities):
+        index = [entity.state._index for entity in entities]
+        if index and index == list(range(index[0], index[0] + len(index))):
+            return slice(index[0], index[0] + len(index))
+        return np.array(index, dtype=int)
+
+
 # properties of landmark entities
 class Landmark(Entity):
     def __init__(self):
@@ -76,6 +443,10 @@ class Border(Entity):
 
 # properties of agent entities
 class Agent(Entity):
+    # bumped whenever any agent's action_callback changes, so that worlds
+    # know to rebuild their policy/scripted agent lists
+    callback_version = 0
+
     def __init__(self):
         super(Agent, self).__init__()
         # agents are movable by default
@@ -97,10 +468,253 @@ class Agent(Entity):
         # script behavior to execute
         self.action_callback = None
 
+    @property
+    def action_callback(self):
+        return self._action_callback
+
+    @action_callback.setter
+    def action_callback(self, callback):
+        self._action_callback = callback
+        Agent.callback_version += 1
+
+
+# list of entities that tells its world whenever it is modified
+class EntityList(list):
+    def __init__(self, world, entities=()):
+        super(EntityList, self).__init__(entities)
+        self.world = world
+
+    def changed(self):
+        self.world.version += 1
+
+    def __reduce__(self):
+        # rebuild in one go when copying/unpickling (the world may be half-built)
+        return (EntityList, (self.world, list(self)))
+
+
+# wrap a list method so that it notifies the world after modifying the list
+def notify_change(method):
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.changed()
+        return result
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend',
+              'insert', 'pop', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(EntityList, _name, notify_change(getattr(list, _name)))
+del _name
+
+
+# squared length of vectors along the last axis, adding one component at a
+# time (much faster than a reduction over such short axes, same result)
+def squared_norm(x):
+    total = np.square(x[..., 0])
+    for k in range(1, x.shape[-1]):
+        total += np.square(x[..., k])
+    return total
+
+
+# an index array as a slice if it is contiguous (slices index views)
+def contiguous_index(index):
+    if len(index) and index[-1] - index[0] == len(index) - 1:
+        return slice(index[0], index[-1] + 1)
+    return index
+
+
+# log(1 + exp(x)) of a Python float, the same as np.logaddexp(0, x)
+def softplus(x):
+    if x > 0:
+        return x + math.log1p(math.exp(-x))
+    return math.log1p(math.exp(x))
+
+
+# grid cell offsets covering each pair of adjacent cells exactly once: the
+# cell itself plus every offset whose first non-zero component is positive
+def half_neighborhood(dim):
+    offsets = []
+    for offset in itertools.product((-1, 0, 1), repeat=dim):
+        nonzero = [o for o in offset if o != 0]
+        if not nonzero or nonzero[0] > 0:
+            offsets.append(np.array(offset))
+    return offsets
+
+
+# immovable wall geometry: axis-aligned boxes and line segments with a half
+# width (capsules), registered once and kept in flat arrays. Colliding movable
+# entities are pushed out of the walls by World.get_wall_contact_forces; with
+# many shapes, the shapes near each entity are found through a uniform grid
+# built once for the current shapes. Walls are not entities, so they add
+# nothing to the entity count, observations or snapshots
+class StaticGeometry(object):
+    def __init__(self):
+        self.boxes = []
+        self.segments = []
+        # color of all walls when rendered
+        self.color = np.array([0.25, 0.25, 0.25])
+        # shapes are looked up through the grid from this many on
+        self.grid_min_shapes = 64
+        self.version = 0
+        self._arrays_version = None
+        self._grid = None
+
+    def __len__(self):
+        return len(self.boxes) + len(self.segments)
+
+    # add the box between corners low and high
+    def add_box(self, low, high):
+        self.boxes.append((np.asarray(low, dtype=float), np.asarray(high, dtype=float)))
+        self.version += 1
+
+    # add the segment from start to end, thickened by width on each side
+    def add_segment(self, start, end, width=0.0):
+        self.segments.append((np.asarray(start, dtype=float), np.asarray(end, dtype=float), float(width)))
+        self.version += 1
+
+    def clear(self):
+        self.boxes = []
+        self.segments = []
+        self.version += 1
+
+    # shape arrays: box corners (K, dim) and segment ends (S, dim) and widths (S,)
+    def build(self):
+        if self._arrays_version == self.version:
+            return
+        dim = len((self.boxes or self.segments)[0][0]) if len(self) else 2
+        self.box_low = np.array([low for low, high in self.boxes]).reshape(-1, dim)
+        self.box_high = np.array([high for low, high in self.boxes]).reshape(-1, dim)
+        self.seg_start = np.array([start for start, end, width in self.segments]).reshape(-1, dim)
+        self.seg_end = np.array([end for start, end, width in self.segments]).reshape(-1, dim)
+        self.seg_width = np.array([width for start, end, width in self.segments])
+        # bounding boxes of all shapes, boxes first
+        self.low = np.concatenate([self.box_low, np.minimum(self.seg_start, self.seg_end) - self.seg_width[:, None]])
+        self.high = np.concatenate([self.box_high, np.maximum(self.seg_start, self.seg_end) + self.seg_width[:, None]])
+        self._arrays_version = self.version
+        self._grid = None
+
+    # index arrays (a, s) of every entity a within reach of the bounding box of
+    # shape s (shape indices count boxes first, then segments), given (M, dim)
+    # positions
+    def get_candidate_pairs(self, p_pos, reach):
+        self.build()
+        if len(self) < self.grid_min_shapes:
+            inside = (p_pos[:, None, :] > self.low - reach) & (p_pos[:, None, :] < self.high + reach)
+            return np.nonzero(np.all(inside, axis=-1))
+        if self._grid is None or self._grid[0] < reach:
+            self._grid = self.build_grid(reach)
+        _, cell_size, origin, grid_shape, cell_keys, cell_start, cell_count, shapes = self._grid
+        cells = np.floor((p_pos - origin) / cell_size).astype(np.int64)
+        inside = np.all((cells >= 0) & (cells < grid_shape), axis=1)
+        index = np.flatnonzero(inside)
+        keys = np.ravel_multi_index(cells[index].T, grid_shape)
+        slot = np.minimum(np.searchsorted(cell_keys, keys), len(cell_keys) - 1)
+        found = cell_keys[slot] == keys
+        count = cell_count[slot[found]]
+        a = np.repeat(index[found], count)
+        within = np.arange(len(a)) - np.repeat(np.cumsum(count) - count, count)
+        s = shapes[np.repeat(cell_start[slot[found]], count) + within]
+        pos = p_pos[a]
+        near = np.all((pos > self.low[s] - reach) & (pos < self.high[s] + reach), axis=1)
+        return a[near], s[near]
+
+    # uniform grid listing, for every cell, the shapes within reach of it
+    def build_grid(self, reach):
+        low, high = self.low - reach, self.high + reach
+        cell_size = max(2 * reach, np.min(high - low))
+        origin = low.min(axis=0)
+        grid_shape = tuple(np.floor((high.max(axis=0) - origin) / cell_size).astype(np.int64) + 1)
+        keys, shapes = [], []
+        for s in range(len(low)):
+            first = np.floor((low[s] - origin) / cell_size).astype(np.int64)
+            last = np.floor((high[s] - origin) / cell_size).astype(np.int64)
+            cells = np.stack(np.meshgrid(*[np.arange(f, l + 1) for f, l in zip(first, last)], indexing='ij'), axis=-1)
+            keys.append(np.ravel_multi_index(cells.reshape(-1, len(first)).T, grid_shape))
+            shapes.append(np.full(keys[-1].shape, s))
+        keys, shapes = np.concatenate(keys), np.concatenate(shapes)
+        order = np.argsort(keys, kind='stable')
+        cell_keys, cell_start, cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+        return reach, cell_size, origin, np.array(grid_shape), cell_keys, cell_start, cell_count, shapes[order]
+
+    # signed distance from (P, dim) points to the surface of the (P,) shapes
+    # paired with them (negative inside), and the outward unit normals there
+    def get_distances(self, p, s):
+        self.build()
+        distance = np.empty(len(p))
+        normal = np.zeros_like(p)
+        box = s < len(self.boxes)
+        if box.any():
+            distance[box], normal[box] = self.box_distances(p[box], s[box])
+        if not box.all():
+            segment = ~box
+            distance[segment], normal[segment] = self.segment_distances(p[segment], s[segment] - len(self.boxes))
+        return distance, normal
+
+    def box_distances(self, p, s):
+        low, high = self.box_low[s], self.box_high[s]
+        delta = p - np.clip(p, low, high)
+        dist = np.sqrt(squared_norm(delta))
+        outside = dist > 0
+        # points inside are pushed out through the nearest face
+        below, above = p - low, high - p
+        axis = np.argmin(np.minimum(below, above), axis=1)
+        rows = np.arange(len(p))
+        depth = np.minimum(below[rows, axis], above[rows, axis])
+        normal = np.zeros_like(p)
+        normal[rows, axis] = np.where(below[rows, axis] < above[rows, axis], -1.0, 1.0)
+        normal[outside] = delta[outside] / dist[outside, None]
+        return np.where(outside, dist, -depth), normal
+
+    def segment_distances(self, p, s):
+        start, end, width = self.seg_start[s], self.seg_end[s], self.seg_width[s]
+        ab = end - start
+        length2 = squared_norm(ab)
+        t = np.clip(np.sum((p - start) * ab, axis=1) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        delta = p - (start + t[:, None] * ab)
+        dist = np.sqrt(squared_norm(delta))
+        # points on the center line are pushed out sideways
+        normal = np.zeros_like(p)
+        normal[:, 0] = 1.0
+        if p.shape[1] == 2:
+            side = np.stack([-ab[:, 1], ab[:, 0]], axis=1)
+            long = length2 > 0
+            normal[long] = side[long] / np.sqrt(length2[long])[:, None]
+        away = dist > 0
+        normal[away] = delta[away] / dist[away, None]
+        return dist - width, normal
+
+    # outlines of all walls for rendering: (K + S, 4, 2) quads
+    def get_quads(self):
+        self.build()
+        low, high = self.box_low[:, :2], self.box_high[:, :2]
+        boxes = np.stack([low, np.stack([high[:, 0], low[:, 1]], axis=1), high,
+                          np.stack([low[:, 0], high[:, 1]], axis=1)], axis=1)
+        start, end = self.seg_start[:, :2], self.seg_end[:, :2]
+        ab = end - start
+        length = np.sqrt(squared_norm(ab))
+        side = np.stack([-ab[:, 1], ab[:, 0]], axis=1) / np.where(length > 0, length, 1.0)[:, None]
+        # segments are drawn at least a little wide
+        side *= np.maximum(self.seg_width, 0.005)[:, None]
+        segments = np.stack([start - side, end - side, end + side, start + side], axis=1)
+        return np.concatenate([boxes, segments])
+
+
+# world attributes holding the entity lists
+ENTITY_LISTS = ('agents', 'landmarks', 'borders')
+
 
 # multi-agent world
 class World(object):
     def __init__(self):
+        # bumped whenever the agent/landmark/border lists change
+        self.version = 0
+        # cached entity lists (rebuilt when the version changes)
+        self._entities = None
+        self._entities_version = None
+        self._agents_version = None
+        self._callback_version = None
+        self._names_version = None
         # list of agents and entities (can change at execution-time!)
         self.agents = []
         self.landmarks = []
@@ -119,55 +733,260 @@ class World(object):
         # contact response parameters
         self.contact_force = 1e+2
         self.contact_margin = 1e-3
+        # sleeping bodies: movable entities other than agents that move slower
+        # than sleep_velocity under less than sleep_force of contact force for
+        # sleep_steps steps are stopped and left out of integration and of
+        # contacts with static or sleeping bodies, until a contact force of at
+        # least sleep_force reaches them or they are moved from outside
+        self.sleeping = False
+        self.sleep_velocity = 1e-4
+        self.sleep_force = 1e-5
+        self.sleep_steps = 10
+        # static walls (see StaticGeometry)
+        self.walls = StaticGeometry()
+        # contacts are ignored beyond this many contact margins of separation
+        # (the softplus penetration is numerically zero there)
+        self.contact_cutoff = 20.0
+        # collision broadphase: True/False to force it on/off, None to use it
+        # automatically once there are enough colliding entities
+        self.broadphase = None
+        self.broadphase_min_entities = 64
+        # up to this many colliding entities, contacts are computed one pair at
+        # a time rather than as (M, M) arrays (cheaper for a handful)
+        self.pairwise_max_entities = 4
+        # minimum contact force for an agent to count as pushing an entity with a
+        # push constraint, measured along contact_axis (None for the magnitude)
+        self.contact_threshold = 0.005
+        self.contact_axis = 0
         # wall boundaries
         self.x_min = -1
         self.x_max = +1
         self.y_min = -1
         self.y_max = +1
+        # scenario-specific dynamic state included in snapshots, as
+        # (object, attribute name) pairs with numeric values
+        self.dynamic_attributes = []
+        # number of steps taken, and values derived from the state at this
+        # step by scenario callbacks (see memo)
+        self.steps = 0
+        self._memo = {}
+        self._memo_key = None
+        # random number stream for physics noise and scenario resets (seeded
+        # from the global numpy state unless seed() is called)
+        self.seed(np.random.randint(2 ** 31))
+        # contiguous entity state arrays (built lazily from the entity lists)
+        self._state = None
+        self._state_version = None
+        self._diagonals = {}
+
+    def seed(self, seed=None):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.np_random = np.random.default_rng(seed)
+
+    # seed for an independent random stream derived from this world's seed (e.g.
+    # a BatchWorld's), without drawing from np_random
+    def spawn_seed(self):
+        return self.seed_sequence.spawn(1)[0]
+
+    # length of the flat snapshot returned by get_state
+    @property
+    def state_size(self):
+        size = 2 * self.state.p_pos.size + len(self.agents) * self.dim_c
+        for obj, name in self.dynamic_attributes:
+            size += np.size(getattr(obj, name))
+        return size
+
+    # snapshot all dynamic state (entity positions and velocities, agent
+    # communication and dynamic_attributes) into a flat array; the random
+    # stream is not included
+    def get_state(self, out=None):
+        state = self.state
+        if out is None:
+            out = np.empty(self.state_size)
+        n = state.p_pos.size
+        out[:n] = state.p_pos.ravel()
+        out[n:2 * n] = state.p_vel.ravel()
+        i = 2 * n
+        for agent in self.agents:
+            out[i:i + self.dim_c] = 0.0 if agent.state.c is None else agent.state.c
+            i += self.dim_c
+        for obj, name in self.dynamic_attributes:
+            value = np.ravel(getattr(obj, name))
+            out[i:i + value.size] = value
+            i += value.size
+        return out
+
+    # restore a snapshot taken by get_state, writing into the existing
+    # entities and arrays
+    def set_state(self, snapshot):
+        if len(snapshot) != self.state_size:
+            raise ValueError('snapshot of size %d does not match this world (%d)' % (len(snapshot), self.state_size))
+        state = self.state
+        n = state.p_pos.size
+        state.p_pos.ravel()[:] = snapshot[:n]
+        state.p_vel.ravel()[:] = snapshot[n:2 * n]
+        i = 2 * n
+        for agent in self.agents:
+            if agent.state.c is not None and agent.state.c.shape == (self.dim_c,):
+                agent.state.c[:] = snapshot[i:i + self.dim_c]
+            else:
+                agent.state.c = snapshot[i:i + self.dim_c].copy()
+            i += self.dim_c
+        for obj, name in self.dynamic_attributes:
+            value = getattr(obj, name)
+            size = np.size(value)
+            if np.ndim(value) == 0:
+                setattr(obj, name, type(value)(snapshot[i]))
+            else:
+                value[...] = snapshot[i:i + size].reshape(np.shape(value))
+            i += size
+        self.clear_memo()
+        self.wake()
+
+    # value of compute() cached under key until the world changes: the cache is
+    # cleared at the end of every step and on resets and restored snapshots, so
+    # that quantities used in the callbacks of every agent (entity lookups,
+    # role lists, shared distances) are computed once per step. Values should
+    # only depend on the world state, and must not be modified by callers
+    def memo(self, key, compute):
+        memo_key = (self.steps, self.version)
+        if self._memo_key != memo_key:
+            self._memo.clear()
+            self._memo_key = memo_key
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def clear_memo(self):
+        self._memo.clear()
+
+    # entity lists are wrapped so that in-place changes are noticed too (they
+    # stay plain attributes, which are much faster to read than properties)
+    def __setattr__(self, name, value):
+        if name in ENTITY_LISTS:
+            value = EntityList(self, value)
+        object.__setattr__(self, name, value)
+        if name in ENTITY_LISTS:
+            self.version += 1
+
+    # return the structure-of-arrays state of all entities, rebuilding it
+    # whenever the entity lists have changed
+    @property
+    def state(self):
+        if self._state_version == self.version:
+            return self._state
+        entities = self.entities
+        previous = self._state
+        self._state = WorldState(entities, self.dim_p)
+        self._state_version = self.version
+        if previous is not None:
+            previous.release(keep=entities)
+        return self._state
+
+    # pairwise distances and overlaps of all entities, computed once per step
+    # and cached like memo (until the end of the step, a reset or a restored
+    # snapshot)
+    @property
+    def contacts(self):
+        state = self.state
+        return self.memo(('contacts', state.layout_version), lambda: Contacts(state))
 
     # return all entities in the world
     @property
     def entities(self):
-        return self.agents + self.landmarks + self.borders
+        if self._entities_version != self.version:
+            self._entities = self.agents + self.landmarks + self.borders
+            self._entities_version = self.version
+        return self._entities
+
+    # entities of a role (see ROLES), in the order of entities
+    def entities_with_role(self, role):
+        state = self.state
+        return [state.entities[i] for i in state.role_index[role]]
+
+    # entities by name; where names repeat, the first entity wins
+    @property
+    def entity_by_name(self):
+        if self._names_version != self.version:
+            self._entity_by_name = {}
+            for entity in self.entities:
+                self._entity_by_name.setdefault(entity.name, entity)
+            self._names_version = self.version
+        return self._entity_by_name
 
     # return all agents controllable by external policies
     @property
     def policy_agents(self):
-        return [agent for agent in self.agents if agent.action_callback is None]
+        self._update_agent_lists()
+        return self._policy_agents
 
     # return all agents controlled by world scripts
     @property
     def scripted_agents(self):
-        return [agent for agent in self.agents if agent.action_callback is not None]
+        self._update_agent_lists()
+        return self._scripted_agents
+
+    def _update_agent_lists(self):
+        if self._agents_version != self.version or self._callback_version != Agent.callback_version:
+            self._policy_agents = [agent for agent in self.agents if agent.action_callback is None]
+            self._scripted_agents = [agent for agent in self.agents if agent.action_callback is not None]
+            self._agents_version = self.version
+            self._callback_version = Agent.callback_version
 
     # update state of the world
     def step(self):
+        # (entity state lives in the contiguous world arrays from here on)
+        state = self.state
         # set actions for scripted agents 
-        for agent in self.scripted_agents:
-            agent.action = agent.action_callback(agent, self)
+        self.apply_scripted_actions()
         # gather forces applied to entities
-        p_force = [None] * len(self.entities)
+        p_force = state.p_force
+        p_force.fill(0.0)
         # apply agent physical controls
         p_force = self.apply_action_force(p_force)
         # # apply wall forces
         # p_force = self.apply_wall_force(p_force)
         # apply environment forces
         p_force = self.apply_environment_force(p_force)
+        if len(self.walls):
+            p_force = self.apply_wall_contact_force(p_force)
         # integrate physical state
         self.integrate_state(p_force)
         # update agent state
-        for agent in self.agents:
-            self.update_agent_state(agent)
+        noise = self.get_noise(state.c_noise[:len(self.agents)], self.dim_c) if state.c_noisy else None
+        for i, agent in enumerate(self.agents):
+            self.update_agent_state(agent, None if noise is None else noise[i])
+        # values memoized for the previous state are stale now
+        self.steps += 1
+        self.clear_memo()
+
+    def apply_scripted_actions(self):
+        for agent in self.scripted_agents:
+            agent.action = agent.action_callback(agent, self)
 
     # gather agent action forces
     def apply_action_force(self, p_force):
         # set applied forces
+        state = self.state
+        noise = self.get_noise(state.u_noise[:len(self.agents)], self.dim_p) if state.u_noisy else None
         for i,agent in enumerate(self.agents):
             if agent.movable:
-                noise = np.random.randn(*agent.action.u.shape) * agent.u_noise if agent.u_noise else 0.0
-                p_force[i] = agent.action.u + noise                
+                if agent.action.u is None:
+                    raise TypeError('agent %r has no physical action (action.u is None)' % agent.name)
+                p_force[i] = agent.action.u
+                if noise is not None:
+                    p_force[i] += noise[i]
         return p_force
 
+    # gaussian noise for a set of entities in one draw, scaled by the (n,)
+    # noise amounts (None if no entity is noisy)
+    def get_noise(self, amount, dim):
+        if not np.any(amount):
+            return None
+        return self.np_random.standard_normal((len(amount), dim)) * amount[:, None]
+
     def apply_wall_force(self, p_force):
         # Adds collisions between agents and bounds (x: [-1,+1], y: [-1,+1])
         for i,agent in enumerate(self.agents):
@@ -178,53 +997,384 @@ class World(object):
 
     # gather physical forces acting on entities
     def apply_environment_force(self, p_force):
-        # simple (but inefficient) collision response
-        for a,entity_a in enumerate(self.entities):
-            for b,entity_b in enumerate(self.entities):
-                if(b <= a): continue
-                [f_a, f_b] = self.get_collision_force(entity_a, entity_b)
-                if(f_a is not None):
-                    if(p_force[a] is None): p_force[a] = 0.0
-                    p_force[a] = f_a + p_force[a] 
-                if(f_b is not None):
-                    if(p_force[b] is None): p_force[b] = 0.0
-                    p_force[b] = f_b + p_force[b]        
+        # collision response between all pairs of colliding entities at once
+        state = self.state
+        if len(state.collider_index) < 2:
+            return p_force
+        colliders = state.collider_view
+        if self.sleeping and state.asleep.any():
+            awake = state.movable & ~state.asleep
+            force = self.get_awake_contact_forces(state.p_pos[colliders], state.size[colliders], awake[colliders])
+        else:
+            force = self.get_contact_forces(state.p_pos[colliders], state.size[colliders])
+        movable = state.collider_movable
+        p_force[state.movable_collider_index] += force if movable is None else force[movable]
         return p_force
 
-    def check_all_agent_in_contact(self, box):
-        all_contact = True
-        contact_threshold = 0.005
+    # push colliding movable entities out of the walls
+    def apply_wall_contact_force(self, p_force):
+        state = self.state
+        pushed = state.movable & state.collide
+        if self.sleeping:
+            pushed &= ~state.asleep
+        index = np.flatnonzero(pushed)
+        if len(index):
+            p_force[index] += self.get_wall_contact_forces(state.p_pos[index], state.size[index])
+        return p_force
 
-        for i, agent in enumerate(self.agents):
-            [f_a, f_b] = self.get_collision_force(agent, box)
-            if abs(f_a[0]) < contact_threshold:
-                all_contact = False
+    # total contact force on each body from the walls, given (..., M, dim_p)
+    # positions and (M,) sizes, with the soft contact used between entities
+    # (treating bodies beyond the contact cutoff as not touching)
+    def get_wall_contact_forces(self, p_pos, size):
+        flat_pos = p_pos.reshape(-1, p_pos.shape[-1])
+        k = self.contact_margin
+        a, s = self.walls.get_candidate_pairs(flat_pos, size.max() + self.contact_cutoff * k)
+        if not len(a):
+            return np.zeros_like(p_pos)
+        distance, normal = self.walls.get_distances(flat_pos[a], s)
+        gap = distance - size[a % len(size)]
+        near = gap < self.contact_cutoff * k
+        a, gap, normal = a[near], gap[near], normal[near]
+        # softmax penetration
+        penetration = np.logaddexp(0, -gap/k)*k
+        force = self.contact_force * normal * penetration[:, None]
+        total = np.zeros_like(flat_pos)
+        for d in range(flat_pos.shape[1]):
+            total[:, d] = np.bincount(a, force[:, d], minlength=len(flat_pos))
+        return total.reshape(p_pos.shape)
 
-        return all_contact
+    # get the total contact force on each body from all other bodies, given
+    # (..., M, dim_p) positions and (M,) sizes (vectorized get_collision_force);
+    # leading dimensions index separate worlds of a batch
+    def get_contact_forces(self, p_pos, size):
+        if p_pos.ndim == 2 and len(size) <= self.pairwise_max_entities:
+            return self.get_pairwise_contact_forces(p_pos, size)
+        if p_pos.ndim == 2 and self.use_broadphase(len(size)):
+            a, b = self.get_candidate_pairs(p_pos, size)
+            return self.get_pair_contact_forces(p_pos, size, a, b)
+        # compute actual distance between all pairs of bodies
+        delta_pos = p_pos[..., :, None, :] - p_pos[..., None, :, :]
+        dist = np.sqrt(squared_norm(delta_pos))
+        itself = self.get_diagonal(len(size))
+        dist[..., itself] = 1.0  # don't collide against itself
+        # minimum allowable distance
+        dist_min = size[:, None] + size[None, :]
+        # softmax penetration
+        k = self.contact_margin
+        penetration = np.logaddexp(0, -(dist - dist_min)/k)*k
+        penetration[..., itself] = 0.0
+        force = self.contact_force * delta_pos / dist[..., None] * penetration[..., None]
+        return np.sum(force, axis=-2)
+
+    # get_contact_forces for (M, dim_p) positions, one pair at a time on Python
+    # floats (for a handful of bodies, numpy's per-call overhead dominates)
+    def get_pairwise_contact_forces(self, p_pos, size):
+        pos, size = p_pos.tolist(), size.tolist()
+        force = [[0.0] * len(p) for p in pos]
+        k = self.contact_margin
+        contact_force = self.contact_force
+        for a in range(len(pos)):
+            pos_a, force_a = pos[a], force[a]
+            for b in range(a + 1, len(pos)):
+                pos_b, force_b = pos[b], force[b]
+                delta_pos = [x - y for x, y in zip(pos_a, pos_b)]
+                dist = 0.0
+                for d in delta_pos:
+                    dist += d * d
+                dist = math.sqrt(dist)
+                # (coincident centers have no contact direction)
+                penetration = softplus(-(dist - (size[a] + size[b]))/k)*k if dist else math.nan
+                for i, d in enumerate(delta_pos):
+                    f = contact_force * d / dist * penetration if dist else math.nan
+                    force_a[i] += f
+                    force_b[i] -= f
+        return np.array(force).reshape(p_pos.shape)
+
+    # get_contact_forces for (M, dim_p) positions, leaving out the pairs in
+    # which neither body is in the (M,) mask of awake movable bodies (and, if
+    # the (M,) mask others is given, those whose other body is not in it). Few
+    # awake bodies are checked against every body, many through the broadphase
+    def get_awake_contact_forces(self, p_pos, size, awake, others=None):
+        active = np.flatnonzero(awake)
+        if self.use_broadphase(len(size)) and len(active) >= self.broadphase_min_entities:
+            a, b = self.get_candidate_pairs(p_pos, size, query=active)
+        else:
+            # every body within the contact cutoff of an awake body
+            dist = np.zeros((len(active), len(size)))
+            for d in range(p_pos.shape[1]):
+                dist += np.square(np.subtract.outer(p_pos[active, d], p_pos[:, d]))
+            np.sqrt(dist, out=dist)
+            gap = dist - (size[active, None] + size[None, :])
+            i, b = np.nonzero(gap < self.contact_cutoff * self.contact_margin)
+            a = active[i]
+        # pairs of awake bodies once, and no self pairs
+        keep = ~awake[b] | (b > a)
+        if others is not None:
+            keep &= others[b]
+        return self.get_pair_contact_forces(p_pos, size, a[keep], b[keep])
+
+    # boolean (n, n) identity mask, cached per size
+    def get_diagonal(self, n):
+        if n not in self._diagonals:
+            self._diagonals[n] = np.eye(n, dtype=bool)
+        return self._diagonals[n]
+
+    # whether to collide n bodies through the broadphase or all pairs
+    def use_broadphase(self, n):
+        if self.broadphase is None:
+            return n >= self.broadphase_min_entities
+        return self.broadphase
+
+    # get the total contact force on each body from the given (a, b) pairs
+    # only, treating pairs beyond the contact cutoff as not touching
+    def get_pair_contact_forces(self, p_pos, size, a, b):
+        delta_pos = p_pos[a] - p_pos[b]
+        dist = np.sqrt(squared_norm(delta_pos))
+        dist_min = size[a] + size[b]
+        near = dist - dist_min < self.contact_cutoff * self.contact_margin
+        a, b = a[near], b[near]
+        delta_pos, dist, dist_min = delta_pos[near], dist[near], dist_min[near]
+        # softmax penetration
+        k = self.contact_margin
+        penetration = np.logaddexp(0, -(dist - dist_min)/k)*k
+        force = self.contact_force * delta_pos / dist[:, None] * penetration[:, None]
+        # equal and opposite forces on both bodies of each pair
+        total = np.zeros_like(p_pos)
+        for d in range(p_pos.shape[1]):
+            total[:, d] = np.bincount(a, force[:, d], minlength=len(size)) - \
+                          np.bincount(b, force[:, d], minlength=len(size))
+        return total
+
+    # broadphase: hash (M, dim_p) positions into a uniform grid whose cells
+    # are as wide as the largest possible contact, and return index arrays
+    # (a, b) of every pair of bodies in the same or adjacent cells (each
+    # unordered pair appears once). Given query indices, instead return the
+    # pairs of each query body a with every body b around it (including a
+    # itself, and both orders of pairs of query bodies)
+    def get_candidate_pairs(self, p_pos, size, query=None):
+        cell_size = 2 * np.max(size) + self.contact_cutoff * self.contact_margin
+        cells = np.floor(p_pos / cell_size).astype(np.int64)
+        # leave a ring of empty cells around the occupied ones for neighbor lookups
+        cells -= cells.min(axis=0) - 1
+        grid_shape = tuple(cells.max(axis=0) + 2)
+        keys = np.ravel_multi_index(cells.T, grid_shape)
+        order = np.argsort(keys, kind='stable')
+        cell_keys, cell_start, cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+        if query is None:
+            bodies = np.arange(len(size))
+            offsets = half_neighborhood(p_pos.shape[1])
+        else:
+            bodies = query
+            offsets = [np.array(offset) for offset in itertools.product((-1, 0, 1), repeat=p_pos.shape[1])]
+        pairs_a, pairs_b = [], []
+        for offset in offsets:
+            neighbor_keys = np.ravel_multi_index((cells[bodies] + offset).T, grid_shape)
+            slot = np.minimum(np.searchsorted(cell_keys, neighbor_keys), len(cell_keys) - 1)
+            found = cell_keys[slot] == neighbor_keys
+            count = cell_count[slot[found]]
+            # one pair per body and occupant of its neighbor cell
+            a = np.repeat(bodies[found], count)
+            within = np.arange(len(a)) - np.repeat(np.cumsum(count) - count, count)
+            b = order[np.repeat(cell_start[slot[found]], count) + within]
+            if query is None and not any(offset):
+                # bodies sharing a cell: keep each pair once and skip self pairs
+                a, b = a[a < b], b[a < b]
+            pairs_a.append(a)
+            pairs_b.append(b)
+        return np.concatenate(pairs_a), np.concatenate(pairs_b)
 
     # integrate physical state
     def integrate_state(self, p_force):
-        for i, entity in enumerate(self.entities):
-            if not entity.movable:
-                continue
-            if "box" in entity.name and not self.check_all_agent_in_contact(entity):
-                continue
-            entity.state.p_vel = entity.state.p_vel * (1 - self.damping)
-            if (p_force[i] is not None):
-                entity.state.p_vel += (p_force[i] / entity.mass) * self.dt
-            if entity.max_speed is not None:
-                speed = np.sqrt(np.square(entity.state.p_vel[0]) + np.square(entity.state.p_vel[1]))
-                if speed > entity.max_speed:
-                    entity.state.p_vel = entity.state.p_vel / np.sqrt(np.square(entity.state.p_vel[0]) +
-                                                                  np.square(entity.state.p_vel[1])) * entity.max_speed
-            entity.state.p_pos += entity.state.p_vel * self.dt
-
-    def update_agent_state(self, agent):
+        state = self.state
+        free, pushed = state.free_index, state.pushed_index
+        awake = None
+        if self.sleeping:
+            self.wake_bodies(p_force)
+            if state.asleep.any():
+                free = np.flatnonzero(state.free_mask & ~state.asleep)
+                awake = ~state.asleep[pushed]
+                pushed = pushed[awake]
+        self.integrate(free, p_force)
+        # entities with a push constraint (boxes) only move while enough agents
+        # push them, judged after the agents have moved
+        if len(pushed):
+            pushers, min_pushers = state.pushers, state.min_pushers
+            if awake is not None:
+                pushers, min_pushers = pushers[:, awake], min_pushers[awake]
+            force = self.get_push_forces(pushed)
+            moved = pushed[self.check_pushed(force, pushers, min_pushers)]
+            if len(moved):
+                self.integrate(moved, p_force)
+        if self.sleeping:
+            self.settle_bodies(p_force)
+
+    # wake sleeping bodies that a contact force reaches or that were moved
+    # since they fell asleep. The contacts they missed while asleep are added
+    # to p_force for this step, which can wake further bodies in turn
+    def wake_bodies(self, p_force):
+        state = self.state
+        if not state.asleep.any():
+            return
+        # movable bodies whose contacts this step's forces cover
+        awake = state.movable & ~state.asleep
+        woken = squared_norm(p_force) >= self.sleep_force ** 2
+        woken |= np.any(state.p_pos != state.sleep_pos, axis=1)
+        woken |= np.any(state.p_vel != 0, axis=1)
+        woken &= state.asleep
+        while woken.any():
+            state.asleep[woken] = False
+            state.rest_steps[woken] = 0
+            self.apply_woken_contact_force(p_force, woken, awake)
+            awake |= woken
+            woken = (squared_norm(p_force) >= self.sleep_force ** 2) & state.asleep
+
+    # add the contact forces on the (n,) mask of woken bodies that were left
+    # out while they slept: from the bodies outside the (n,) mask of awake
+    # bodies whose contacts are already in p_force, and from the walls
+    def apply_woken_contact_force(self, p_force, woken, awake):
+        state = self.state
+        colliders = state.collider_index
+        active = woken[colliders]
+        if len(colliders) >= 2 and active.any():
+            force = self.get_awake_contact_forces(state.p_pos[colliders], state.size[colliders], active,
+                                                  others=~awake[colliders])
+            movable = state.movable[colliders]
+            p_force[colliders[movable]] += force[movable]
+        if len(self.walls):
+            index = np.flatnonzero(woken & state.collide)
+            if len(index):
+                p_force[index] += self.get_wall_contact_forces(state.p_pos[index], state.size[index])
+
+    # count the steps each awake movable body (other than agents) has been at
+    # rest, and put those at rest for sleep_steps steps to sleep
+    def settle_bodies(self, p_force):
+        state = self.state
+        resting = state.movable & ~state.asleep & (state.role != AGENT)
+        resting &= squared_norm(state.p_vel) < self.sleep_velocity ** 2
+        resting &= squared_norm(p_force) < self.sleep_force ** 2
+        state.rest_steps[:] = np.where(resting, state.rest_steps + 1, 0)
+        falling = state.rest_steps >= self.sleep_steps
+        if falling.any():
+            state.asleep[falling] = True
+            state.rest_steps[falling] = 0
+            state.p_vel[falling] = 0.0
+            state.sleep_pos[falling] = state.p_pos[falling]
+
+    # wake all sleeping bodies (e.g. after a reset)
+    def wake(self):
+        state = self.state
+        state.asleep.fill(False)
+        state.rest_steps.fill(0)
+
+    # (n_agents, K, dim_p) contact forces on the agents from the K entities in
+    # index (zero where either does not collide), see get_collision_force
+    def get_push_forces(self, index):
+        state = self.state
+        n = len(self.agents)
+        if n + len(index) <= self.pairwise_max_entities:
+            return self.get_pairwise_push_forces(index)
+        touching = state.collide[:n, None] & state.collide[index][None, :]
+        delta_pos = state.p_pos[:n, None, :] - state.p_pos[index][None, :, :]
+        dist = np.where(touching, np.sqrt(squared_norm(delta_pos)), 1.0)
+        dist_min = state.size[:n, None] + state.size[index][None, :]
+        k = self.contact_margin
+        penetration = np.where(touching, np.logaddexp(0, -(dist - dist_min)/k)*k, 0.0)
+        return self.contact_force * delta_pos / dist[:, :, None] * penetration[:, :, None]
+
+    # get_push_forces one pair at a time on Python floats (see
+    # get_pairwise_contact_forces)
+    def get_pairwise_push_forces(self, index):
+        state = self.state
+        n = len(self.agents)
+        agent_pos, agent_size = state.p_pos[:n].tolist(), state.size[:n].tolist()
+        pos, size = state.p_pos[index].tolist(), state.size[index].tolist()
+        touching = (state.collide[:n, None] & state.collide[index][None, :]).tolist()
+        k = self.contact_margin
+        force = np.zeros((n, len(index), self.dim_p))
+        for a in range(n):
+            for b in range(len(index)):
+                if not touching[a][b]:
+                    continue
+                delta_pos = [x - y for x, y in zip(agent_pos[a], pos[b])]
+                dist = 0.0
+                for d in delta_pos:
+                    dist += d * d
+                dist = math.sqrt(dist)
+                penetration = softplus(-(dist - (agent_size[a] + size[b]))/k)*k
+                force[a, b] = [self.contact_force * d / dist * penetration if dist else math.nan for d in delta_pos]
+        return force
+
+    # whether enough agents push each constrained entity, given the
+    # (..., n_agents, K, dim_p) contact forces on the agents from the K entities,
+    # the (n_agents, K) mask of agents that count and the (K,) required numbers
+    def check_pushed(self, force, pushers, min_pushers):
+        if self.contact_axis is None:
+            magnitude = np.sqrt(squared_norm(force))
+        else:
+            magnitude = np.abs(force[..., self.contact_axis])
+        pushing = ~(magnitude < self.contact_threshold) & pushers
+        return np.count_nonzero(pushing, axis=-2) >= min_pushers
+
+    # update velocity and position of the entities in index (an index array or
+    # slice) in place
+    def integrate(self, index, p_force):
+        state = self.state
+        # (a slice indexes views, which are updated in place)
+        p_vel = state.p_vel[index]
+        if not len(p_vel):
+            return
+        if isinstance(index, slice) and len(p_vel) <= self.pairwise_max_entities:
+            return self.integrate_scalar(index, p_force)
+        p_vel *= 1 - self.damping
+        p_vel += (p_force[index] / state.mass[index, None]) * self.dt
+        # clamp to max speed
+        if state.speed_limited:
+            max_speed = state.max_speed[index]
+            speed = np.sqrt(np.add.reduce(np.square(p_vel), axis=1))
+            fast = speed > max_speed
+            if fast.any():
+                p_vel[fast] = p_vel[fast] / speed[fast, None] * max_speed[fast, None]
+        if not isinstance(index, slice):
+            state.p_vel[index] = p_vel
+        state.p_pos[index] += p_vel * self.dt
+
+    # integrate one entity at a time on Python floats, which is faster for the
+    # few moving entities of the small scenarios (same operations as integrate).
+    # index is a slice, so the flattened rows are views into the arrays
+    def integrate_scalar(self, index, p_force):
+        state = self.state
+        dim = state.p_vel.shape[1]
+        p_vel, p_pos = state.p_vel[index].ravel(), state.p_pos[index].ravel()
+        vel, pos, force = p_vel.tolist(), p_pos.tolist(), p_force[index].ravel().tolist()
+        mass = state.mass[index].tolist()
+        max_speed = state.max_speed[index].tolist() if state.speed_limited else None
+        damping = 1 - self.damping
+        dt = self.dt
+        for i, m in enumerate(mass):
+            entity = range(i * dim, (i + 1) * dim)
+            for k in entity:
+                vel[k] = vel[k] * damping + (force[k] / m) * dt
+            # clamp to max speed
+            if max_speed is not None:
+                speed = 0.0
+                for k in entity:
+                    speed += vel[k] * vel[k]
+                speed = math.sqrt(speed)
+                if speed > max_speed[i]:
+                    for k in entity:
+                        vel[k] = vel[k] / speed * max_speed[i]
+            for k in entity:
+                pos[k] += vel[k] * dt
+        p_vel[:] = vel
+        p_pos[:] = pos
+
+    def update_agent_state(self, agent, noise=None):
         # set communication state (directly for now)
         if agent.silent:
             agent.state.c = np.zeros(self.dim_c)
         else:
-            noise = np.random.randn(*agent.action.c.shape) * agent.c_noise if agent.c_noise else 0.0
+            if noise is None:
+                noise = self.np_random.standard_normal(agent.action.c.shape) * agent.c_noise if agent.c_noise else 0.0
             agent.state.c = agent.action.c + noise      
 
     # get collision forces for any contact between two entities
@@ -274,3 +1424,156 @@ class World(object):
         force = [force_x, force_y]
 
         return force
+
+
+# physics of B copies of a world that share its entity layout, stepped
+# together on (B, N, dim_p) state arrays
+class BatchWorld(object):
+    def __init__(self, world, batch_size, seed=None):
+        if world.scripted_agents:
+            raise ValueError('batched worlds do not support scripted agents')
+        # template world (physical parameters and collision routines)
+        self.world = world
+        self.batch_size = batch_size
+        self.dim_p = world.dim_p
+        self.dim_c = world.dim_c
+        self.n_agents = len(world.agents)
+        # shared entity layout
+        layout = world.state
+        self.size = layout.size.copy()
+        self.mass = layout.mass.copy()
+        self.movable = layout.movable.copy()
+        self.collide = layout.collide.copy()
+        self.max_speed = layout.max_speed.copy()
+        self.colliders = np.flatnonzero(self.collide)
+        self.pushed = layout.pushed_index.copy()
+        self.pushers = layout.pushers.copy()
+        self.min_pushers = layout.min_pushers.copy()
+        # agent properties
+        self.u_noise = np.array([agent.u_noise or 0.0 for agent in world.agents])
+        self.c_noise = np.array([agent.c_noise or 0.0 for agent in world.agents])
+        self.silent = np.array([agent.silent for agent in world.agents], dtype=bool)
+        # batched state, starting as copies of the template world
+        self.p_pos = np.repeat(layout.p_pos[None], batch_size, axis=0)
+        self.p_vel = np.repeat(layout.p_vel[None], batch_size, axis=0)
+        self.c = np.zeros((batch_size, self.n_agents, self.dim_c))
+        self.load_world(world)
+        # random number stream for the noise of all worlds (drawn in one go)
+        self.seed(world.spawn_seed() if seed is None else seed)
+
+    def seed(self, seed=None):
+        self.np_random = np.random.default_rng(seed)
+
+    # copy the state of a world into the given batch entries
+    def load_world(self, world, index=slice(None)):
+        self.p_pos[index] = world.state.p_pos
+        self.p_vel[index] = world.state.p_vel
+        for i, agent in enumerate(world.agents):
+            if agent.state.c is not None:
+                self.c[index, i] = agent.state.c
+
+    # copy one batch entry back into a world (e.g. for rendering or scenario callbacks)
+    def store_world(self, world, index):
+        world.state.p_pos[:] = self.p_pos[index]
+        world.state.p_vel[:] = self.p_vel[index]
+        for i, agent in enumerate(world.agents):
+            agent.state.c = self.c[index, i].copy()
+        world.clear_memo()
+
+    # snapshots of all worlds as a (B, world.state_size) array in the layout of
+    # World.get_state; dynamic_attributes are not simulated in the batch and
+    # are taken from the template world
+    def get_state(self, out=None):
+        if out is None:
+            out = np.empty((self.batch_size, self.world.state_size))
+        n = self.p_pos[0].size
+        m = self.c[0].size
+        out[:, :n] = self.p_pos.reshape(self.batch_size, -1)
+        out[:, n:2 * n] = self.p_vel.reshape(self.batch_size, -1)
+        out[:, 2 * n:2 * n + m] = self.c.reshape(self.batch_size, -1)
+        out[:, 2 * n + m:] = self.world.get_state()[2 * n + m:]
+        return out
+
+    # update state of all worlds given (B, n_agents, dim_p) physical and
+    # optional (B, n_agents, dim_c) communication actions
+    def step(self, u, c=None):
+        # gather forces applied to entities
+        p_force = np.zeros_like(self.p_pos)
+        # apply agent physical controls
+        p_force = self.apply_action_force(p_force, u)
+        # apply environment forces
+        p_force = self.apply_environment_force(p_force)
+        if len(self.world.walls):
+            p_force = self.apply_wall_contact_force(p_force)
+        # integrate physical state
+        self.integrate_state(p_force)
+        # update agent state
+        self.update_agent_state(c)
+
+    # gather agent action forces
+    def apply_action_force(self, p_force, u):
+        movable = np.flatnonzero(self.movable[:self.n_agents])
+        p_force[:, movable] = u[:, movable]
+        noisy = np.flatnonzero(self.u_noise[movable])
+        if len(noisy):
+            noisy = movable[noisy]
+            p_force[:, noisy] += self.np_random.standard_normal((self.batch_size, len(noisy), self.dim_p)) * self.u_noise[noisy, None]
+        return p_force
+
+    # gather physical forces acting on entities
+    def apply_environment_force(self, p_force):
+        if len(self.colliders) < 2:
+            return p_force
+        force = self.world.get_contact_forces(self.p_pos[:, self.colliders], self.size[self.colliders])
+        movable = self.movable[self.colliders]
+        p_force[:, self.colliders[movable]] += force[:, movable]
+        return p_force
+
+    # push colliding movable entities out of the walls
+    def apply_wall_contact_force(self, p_force):
+        index = np.flatnonzero(self.movable & self.collide)
+        if len(index):
+            p_force[:, index] += self.world.get_wall_contact_forces(self.p_pos[:, index], self.size[index])
+        return p_force
+
+    # integrate physical state
+    def integrate_state(self, p_force):
+        p_vel = self.p_vel * (1 - self.world.damping)
+        p_vel += (p_force / self.mass[:, None]) * self.world.dt
+        speed = np.sqrt(squared_norm(p_vel))
+        fast = speed > self.max_speed
+        p_vel[fast] = p_vel[fast] / speed[fast][:, None] * np.broadcast_to(self.max_speed, fast.shape)[fast][:, None]
+        p_pos = self.p_pos + p_vel * self.world.dt
+        active = np.repeat(self.movable[None], self.batch_size, axis=0)
+        if len(self.pushed):
+            # constrained entities only move while enough agents push them; as
+            # in World.integrate_state this sees the agents' updated positions
+            agents = np.arange(self.n_agents)
+            agent_pos = np.where(active[:, agents, None], p_pos[:, agents], self.p_pos[:, agents])
+            force = self.get_push_forces(agent_pos, self.p_pos[:, self.pushed], self.pushed)
+            active[:, self.pushed] &= self.world.check_pushed(force, self.pushers, self.min_pushers)
+        self.p_vel = np.where(active[:, :, None], p_vel, self.p_vel)
+        self.p_pos = np.where(active[:, :, None], p_pos, self.p_pos)
+
+    # (B, n_agents, K, dim_p) contact forces on the agents from K entities, given
+    # (B, n_agents, dim_p) agent and (B, K, dim_p) entity positions and the
+    # entities' indices (zero where either does not collide)
+    def get_push_forces(self, agent_pos, box_pos, index):
+        world = self.world
+        delta_pos = agent_pos[:, :, None, :] - box_pos[:, None, :, :]
+        dist = np.sqrt(squared_norm(delta_pos))
+        dist_min = self.size[:self.n_agents, None] + self.size[index][None, :]
+        k = world.contact_margin
+        penetration = np.logaddexp(0, -(dist - dist_min)/k)*k
+        penetration *= self.collide[:self.n_agents, None] & self.collide[index][None, :]
+        return world.contact_force * delta_pos / dist[..., None] * penetration[..., None]
+
+    def update_agent_state(self, c):
+        # set communication state (directly for now)
+        if c is None:
+            c = np.zeros_like(self.c)
+        c = np.where(self.silent[None, :, None], 0.0, c)
+        noisy = np.flatnonzero(self.c_noise * ~self.silent)
+        if len(noisy):
+            c[:, noisy] += self.np_random.standard_normal((self.batch_size, len(noisy), self.dim_c)) * self.c_noise[noisy, None]
+        self.c = c
@@ -1,8 +1,8 @@
 import gym
-import random
 import gym.spaces as spaces
 from gym.envs.registration import EnvSpec
 import numpy as np
+from multiagent.core import BatchWorld, BORDER, GOAL, TARGET
 from multiagent.multi_discrete import MultiDiscrete
 
 
@@ -15,7 +15,10 @@ class MultiAgentEnv(gym.Env):
 
     def __init__(self, world, reset_callback=None, reward_callback=None,
                  observation_callback=None, info_callback=None,
-                 done_callback=None, shared_viewer=True):
+                 done_callback=None, shared_viewer=True, batch_reward_callback=None,
+                 array_output=False, observation_into_callback=None,
+                 observation_layout_callback=None, global_reward_callback=None,
+                 rewards_callback=None):
         self.world = world
         self.agents = self.world.policy_agents
         # set required vectorized gym env property
@@ -23,9 +26,17 @@ class MultiAgentEnv(gym.Env):
         # scenario callbacks
         self.reset_callback = reset_callback
         self.reward_callback = reward_callback
+        # optional world -> reward shared by every agent (evaluated once per step)
+        self.global_reward_callback = global_reward_callback
+        # optional world -> (n_agents,) rewards of all agents at once
+        self.rewards_callback = rewards_callback
         self.observation_callback = observation_callback
+        # optional (agent, world, out) callback writing the observation into out
+        self.observation_into_callback = observation_into_callback
         self.info_callback = info_callback
         self.done_callback = done_callback
+        # optional (world, batch_world) -> (B, n_agents) rewards used by evaluate_sequences
+        self.batch_reward_callback = batch_reward_callback
         # environment parameters
         self.discrete_action_space = False  # NOTE For MADDPG, this has to be set to True
         # if true, action is a number 0...N, otherwise action is a one-hot N-dimensional vector
@@ -34,11 +45,16 @@ class MultiAgentEnv(gym.Env):
         self.force_discrete_action = world.discrete_action if hasattr(world, 'discrete_action') else False
         # if true, every agent has the same reward
         self.shared_reward = world.collaborative if hasattr(world, 'collaborative') else False
+        # if true, step and reset return stacked arrays instead of per-agent lists
+        # (written into buffers that are reused by the next call)
+        self.array_output = array_output
         self.time = 0
 
         # configure spaces
         self.action_space = []
         self.observation_space = []
+        # (name, size) segments of each agent's observation, if the scenario describes them
+        self.observation_layout = None if observation_layout_callback is None else []
         for agent in self.agents:
             total_action_space = []
             # physical action space
@@ -66,10 +82,24 @@ class MultiAgentEnv(gym.Env):
             else:
                 self.action_space.append(total_action_space[0])
             # observation space
-            obs_dim = len(observation_callback(agent, self.world))
+            if observation_layout_callback is not None:
+                layout = observation_layout_callback(agent, self.world)
+                self.observation_layout.append(layout)
+                obs_dim = sum(size for _, size in layout)
+            else:
+                obs_dim = len(observation_callback(agent, self.world))
             self.observation_space.append(spaces.Box(low=-np.inf, high=+np.inf, shape=(obs_dim,), dtype=np.float32))
             agent.action.c = np.zeros(self.world.dim_c)
 
+        # stacked output buffers; observations of different sizes are zero
+        # padded to the largest one, with obs_mask marking the valid entries
+        self.obs_sizes = np.array([space.shape[0] for space in self.observation_space], dtype=int)
+        self.obs_mask = np.arange(max(self.obs_sizes, default=0)) < self.obs_sizes[:, None]
+        self._obs_buffer = np.zeros(self.obs_mask.shape)
+        self._obs_rows = self._get_obs_rows(self._obs_buffer)
+        self._reward_buffer = np.zeros(self.n)
+        self._done_buffer = np.zeros(self.n, dtype=bool)
+
         # rendering
         self.shared_viewer = shared_viewer
         if self.shared_viewer:
@@ -77,10 +107,26 @@ class MultiAgentEnv(gym.Env):
         else:
             self.viewers = [None] * self.n
         self._reset_render()
-
-    def seed(self, seed):
-        random.seed(seed)
-        np.random.seed(seed)
+        self._batch_world = None
+        self._action_decoder = None
+
+    # time each phase of step, reset and render with a multiagent.profiler.Profiler
+    # (a new one if not given), which is returned; see disable_profiling
+    def enable_profiling(self, profiler=None, dump_every=None):
+        from multiagent.profiler import Profiler
+        self.disable_profiling()
+        self.profiler = Profiler(dump_every=dump_every) if profiler is None else profiler
+        self.profiler.attach_env(self)
+        return self.profiler
+
+    def disable_profiling(self):
+        if getattr(self, 'profiler', None) is not None:
+            self.profiler.detach()
+        self.profiler = None
+
+    # seed the world's own random stream (used by physics noise and scenario resets)
+    def seed(self, seed=None):
+        self.world.seed(seed)
 
     def step(self, action_n):
         obs_n = []
@@ -89,16 +135,22 @@ class MultiAgentEnv(gym.Env):
         info_n = {'n': []}
         self.agents = self.world.policy_agents
         # set action for each agent
-        for i, agent in enumerate(self.agents):
-            self._set_action(action_n[i], agent, self.action_space[i])
+        self._set_actions(action_n)
         # advance world state
         self.world.step()
+        if self.array_output:
+            arrays = self._get_arrays()
+            self.time += 1
+            return arrays
         # record observation for each agent
-        for agent in self.agents:
-            obs_n.append(self._get_obs(agent))
-            reward_n.append(self._get_reward(agent))
+        obs_rows = self._new_obs_rows()
+        rewards = self._get_rewards()
+        for i, agent in enumerate(self.agents):
+            obs_n.append(self._get_obs(agent, obs_rows[i]))
+            reward_n.append(self._get_reward(agent) if rewards is None else rewards[i])
             done_n.append(self._get_done(agent))
             info_n['n'].append(self._get_info(agent))
+        self.time += 1
 
         # all agents get total reward in cooperative case
         reward = np.sum(reward_n)
@@ -113,26 +165,131 @@ class MultiAgentEnv(gym.Env):
     def reset(self):
         # reset world
         self.reset_callback(self.world)
+        self.world.clear_memo()
+        self.world.wake()
+        self.time = 0
         # reset renderer
         self._reset_render()
         # record observations for each agent
         obs_n = []
         self.agents = self.world.policy_agents
-        for agent in self.agents:
-            obs_n.append(self._get_obs(agent))
+        if self.array_output:
+            for i, agent in enumerate(self.agents):
+                self._get_obs_row(agent, i)
+            return self._obs_buffer
+        obs_rows = self._new_obs_rows()
+        for i, agent in enumerate(self.agents):
+            obs_n.append(self._get_obs(agent, obs_rows[i]))
         return obs_n
         # return obs_n[0]  # NOTE dkk Required for single agent rl
 
+    # snapshot the environment (step counter and world state) into a flat array
+    def get_state(self, out=None):
+        if out is None:
+            out = np.empty(1 + self.world.state_size)
+        out[0] = self.time
+        self.world.get_state(out=out[1:])
+        return out
+
+    # restore a snapshot taken by get_state
+    def set_state(self, snapshot):
+        self.time = int(snapshot[0])
+        self.world.set_state(snapshot[1:])
+
+    # evaluate M open-loop action sequences of horizon H starting from the same
+    # snapshot, given as an (M, H, n_agents, action_dim) array laid out like the
+    # per-agent actions of step; the physics of all sequences is stepped at once.
+    # Returns (M, n_agents) summed rewards and (M, snapshot size) final states.
+    # The environment itself is left at the starting snapshot.
+    def evaluate_sequences(self, snapshot, actions):
+        actions = np.asarray(actions, dtype=float)
+        n_seq, horizon = actions.shape[:2]
+        self.set_state(snapshot)
+        batch = self._get_batch_world(n_seq)
+        batch.load_world(self.world)
+        returns = np.zeros((n_seq, self.n))
+        decoder = self._get_action_decoder()
+        for t in range(horizon):
+            u, c = decoder.decode(actions[:, t])
+            batch.step(u, c)
+            returns += self._get_batch_reward(batch)
+        final = np.empty((n_seq, len(snapshot)))
+        final[:, 0] = self.time + horizon
+        batch.get_state(out=final[:, 1:])
+        self.set_state(snapshot)
+        return returns, final
+
+    # batched world for evaluate_sequences, rebuilt when the layout changes
+    def _get_batch_world(self, batch_size):
+        state = self.world.state
+        key = (state, state.layout_version, batch_size)
+        if self._batch_world is None or self._batch_world[0] != key:
+            self._batch_world = (key, BatchWorld(self.world, batch_size))
+        return self._batch_world[1]
+
+    # rewards of all batch entries, from the batched callback if the scenario has
+    # one and otherwise by copying each entry into the world in turn
+    def _get_batch_reward(self, batch):
+        if self.batch_reward_callback is not None:
+            reward = np.asarray(self.batch_reward_callback(self.world, batch), dtype=float)
+        else:
+            reward = np.empty((batch.batch_size, self.n))
+            for b in range(batch.batch_size):
+                batch.store_world(self.world, b)
+                rewards = self._get_rewards()
+                for i, agent in enumerate(self.agents):
+                    reward[b, i] = self._get_reward(agent) if rewards is None else rewards[i]
+        if self.shared_reward:
+            reward = np.repeat(np.sum(reward, axis=1, keepdims=True), self.n, axis=1)
+        return reward
+
+    # views of the rows of an (n, max obs size) array trimmed to each agent's size
+    def _get_obs_rows(self, obs):
+        return [obs[i, :size] for i, size in enumerate(self.obs_sizes)]
+
+    # rows of a new array for scenarios that write observations in place
+    def _new_obs_rows(self):
+        if self.observation_into_callback is None:
+            return [None] * self.n
+        return self._get_obs_rows(np.empty(self._obs_buffer.shape))
+
+    # write the observation of the i-th agent into its row of the stacked buffer
+    def _get_obs_row(self, agent, i):
+        row = self._obs_rows[i]
+        obs = self._get_obs(agent, row)
+        if obs is not row:
+            row[:] = obs
+
+    # stacked step outputs: (n, max obs size) observations, (n,) rewards and dones
+    def _get_arrays(self):
+        reward = self._reward_buffer
+        done = self._done_buffer
+        info_n = {'n': []}
+        rewards = self._get_rewards()
+        for i, agent in enumerate(self.agents):
+            self._get_obs_row(agent, i)
+            reward[i] = self._get_reward(agent) if rewards is None else rewards[i]
+            done[i] = self._get_done(agent)
+            info_n['n'].append(self._get_info(agent))
+        # all agents get total reward in cooperative case
+        if self.shared_reward:
+            reward[:] = np.sum(reward)
+        return self._obs_buffer, reward, done, info_n
+
     # get info used for benchmarking
     def _get_info(self, agent):
         if self.info_callback is None:
             return {}
         return self.info_callback(agent, self.world)
 
-    # get observation for a particular agent
-    def _get_obs(self, agent):
+    # get observation for a particular agent, written into out when the
+    # scenario supports it
+    def _get_obs(self, agent, out=None):
         if self.observation_callback is None:
             return np.zeros(0)
+        if out is not None and self.observation_into_callback is not None:
+            self.observation_into_callback(agent, self.world, out)
+            return out
         return self.observation_callback(agent, self.world)
 
     # get dones for a particular agent
@@ -148,56 +305,41 @@ class MultiAgentEnv(gym.Env):
             return 0.0
         return self.reward_callback(agent, self.world)
 
+    # action decoder for the current action modes and entity layout
+    def _get_action_decoder(self):
+        state = self.world.state
+        key = (self.discrete_action_input, self.discrete_action_space, self.force_discrete_action,
+               state, state.layout_version)
+        if self._action_decoder is None or self._action_decoder[0] != key:
+            self._action_decoder = (key, ActionDecoder(self))
+        return self._action_decoder[1]
+
+    # set env actions of all agents from a list of per-agent actions or an
+    # (n_agents, action_dim) array
+    def _set_actions(self, action_n):
+        decoder = self._get_action_decoder()
+        if not isinstance(action_n, np.ndarray) and self.n <= decoder.rowwise_max_agents:
+            for i, agent in enumerate(self.agents):
+                agent.action.u, agent.action.c = decoder.decode_row(action_n[i], i)
+            return
+        u, c = decoder.decode(decoder.pack(action_n))
+        for i, agent in enumerate(self.agents):
+            agent.action.u = u[i]
+            agent.action.c = c[i]
+
+    # get rewards of all agents at once, if the scenario computes them that way
+    # (None otherwise); a global reward is evaluated once and given to every agent
+    def _get_rewards(self):
+        if self.rewards_callback is not None:
+            return self.rewards_callback(self.world)
+        if self.global_reward_callback is not None:
+            return np.full(self.n, self.global_reward_callback(self.world))
+        return None
+
     # set env action for a particular agent
     def _set_action(self, action, agent, action_space, time=None):
-        agent.action.u = np.zeros(self.world.dim_p)
-        agent.action.c = np.zeros(self.world.dim_c)
-        # process action
-        if isinstance(action_space, MultiDiscrete):
-            act = []
-            size = action_space.high - action_space.low + 1
-            index = 0
-            for s in size:
-                act.append(action[index:(index+s)])
-                index += s
-            action = act
-        else:
-            action = [action]
-
-        if agent.movable:
-            # physical action
-            if self.discrete_action_input:
-                agent.action.u = np.zeros(self.world.dim_p)
-                # process discrete action
-                if action[0] == 1: agent.action.u[0] = -1.0
-                if action[0] == 2: agent.action.u[0] = +1.0
-                if action[0] == 3: agent.action.u[1] = -1.0
-                if action[0] == 4: agent.action.u[1] = +1.0
-            else:
-                if self.force_discrete_action:
-                    d = np.argmax(action[0])
-                    action[0][:] = 0.0
-                    action[0][d] = 1.0
-                if self.discrete_action_space:
-                    agent.action.u[0] += action[0][1] - action[0][2]
-                    agent.action.u[1] += action[0][3] - action[0][4]
-                else:
-                    agent.action.u = action[0]
-            sensitivity = 2.0
-            if agent.accel is not None:
-                sensitivity = agent.accel
-            agent.action.u *= sensitivity
-            action = action[1:]
-        if not agent.silent:
-            # communication action
-            if self.discrete_action_input:
-                agent.action.c = np.zeros(self.world.dim_c)
-                agent.action.c[action[0]] = 1.0
-            else:
-                agent.action.c = action[0]
-            action = action[1:]
-        # make sure we used all elements of action
-        assert len(action) == 0
+        decoder = self._get_action_decoder()
+        agent.action.u, agent.action.c = decoder.decode_row(action, self.agents.index(agent))
 
     # reset rendering assets
     def _reset_render(self):
@@ -242,13 +384,13 @@ class MultiAgentEnv(gym.Env):
             self.render_geoms_xform = []
 
             for entity in vis_entities:
-                if "border" in entity.name:
+                if entity.role == BORDER:
                     geom = rendering.make_polygon(entity.shape)
                 else:
                     geom = rendering.make_circle(entity.size)
 
                 xform = rendering.Transform()
-                if 'goal' in entity.name or "target" in entity.name:
+                if entity.role == GOAL or entity.role == TARGET:
                     geom.set_color(*entity.color, alpha=0.5)
                 else:
                     geom.set_color(*entity.color)
@@ -256,6 +398,12 @@ class MultiAgentEnv(gym.Env):
                 self.render_geoms.append(geom)
                 self.render_geoms_xform.append(xform)
 
+            # all walls as one geometry
+            if len(self.world.walls):
+                geom = rendering.make_quads(self.world.walls.get_quads())
+                geom.set_color(*self.world.walls.color)
+                self.render_geoms.append(geom)
+
             # add geoms to viewer
             for viewer in self.viewers:
                 viewer.geoms = []
@@ -301,8 +449,120 @@ class MultiAgentEnv(gym.Env):
         return dx
 
 
+# decodes flat per-agent action rows into physical and communication actions,
+# precomputed from the env's action modes and the agents' properties. A row holds
+# the physical action (if the agent is movable) followed by the communication
+# action (if it is not silent), each as an index, a one-hot/logit vector or a
+# continuous vector depending on the modes, as described in MultiAgentEnv
+class ActionDecoder(object):
+    # lists of actions of up to this many agents are decoded one row at a time
+    # (see decode_row) rather than as an array
+    rowwise_max_agents = 8
+
+    def __init__(self, env):
+        dim_p, dim_c = env.world.dim_p, env.world.dim_c
+        agents = env.agents
+        self.dim_c = dim_c
+        self.discrete_input = env.discrete_action_input
+        self.discrete_space = env.discrete_action_space
+        self.force_discrete = env.force_discrete_action
+        self.movable = np.array([agent.movable for agent in agents], dtype=bool)
+        self.silent = np.array([agent.silent for agent in agents], dtype=bool)
+        self.sensitivity = np.array([2.0 if agent.accel is None else agent.accel for agent in agents])[:, None]
+        # columns of the physical and communication parts of each row
+        if self.discrete_input:
+            self.u_size, c_size = 1, 1
+        else:
+            self.u_size, c_size = (dim_p * 2 + 1 if self.discrete_space else dim_p), dim_c
+        c_start = np.where(self.movable, self.u_size, 0)
+        self.size = c_start + np.where(self.silent, 0, c_size)
+        # (silent agents read column 0, which is then ignored)
+        self.c_index = np.where(self.silent[:, None], 0, c_start[:, None] + np.arange(c_size))
+        self.agent_index = np.arange(len(agents))[:, None]
+        self.width = max(np.max(self.size, initial=0), self.u_size, np.max(self.c_index, initial=-1) + 1)
+        # physical action of each discrete input: none, then -/+ along each axis
+        self.moves = np.zeros((dim_p * 2 + 1, dim_p))
+        self.moves[1::2] = -np.eye(dim_p)
+        self.moves[2::2] = +np.eye(dim_p)
+        self.comms = np.eye(dim_c)
+        self.rows = np.zeros((len(agents), self.width))
+        # the same per agent as Python values, for decode_row
+        self.row_movable = self.movable.tolist()
+        self.row_silent = self.silent.tolist()
+        self.row_sensitivity = self.sensitivity[:, 0].tolist()
+        self.row_size = self.size.tolist()
+        self.row_c = [slice(start, start + c_size) for start in c_start.tolist()]
+
+    # flatten one agent's action (an index, an array or a tuple of arrays)
+    def pack_row(self, action, i):
+        if isinstance(action, np.ndarray):
+            action = action.ravel()
+        elif isinstance(action, (list, tuple)):
+            action = np.concatenate([np.ravel(a) for a in action])
+        else:
+            action = np.ravel(action)
+        # make sure the action has exactly the agent's elements
+        assert len(action) == self.row_size[i]
+        return action
+
+    # physical and communication action of one agent, as decode gives them
+    # for its row (cheaper than decode for a handful of agents)
+    def decode_row(self, action, i):
+        row = np.asarray(self.pack_row(action, i), dtype=float)
+        if not self.row_movable[i]:
+            u = np.zeros(self.moves.shape[1])
+        elif self.discrete_input:
+            u = self.moves[int(row[0])] * self.row_sensitivity[i]
+        else:
+            u = row[:self.u_size]
+            if self.force_discrete:
+                u = np.eye(self.u_size)[np.argmax(u)]
+            if self.discrete_space:
+                u = u[1::2] - u[2::2]
+            u = u * self.row_sensitivity[i]
+        if self.row_silent[i]:
+            c = np.zeros(self.dim_c)
+        elif self.discrete_input:
+            c = self.comms[int(row[self.row_c[i].start])].copy()
+        else:
+            c = row[self.row_c[i]].copy()
+        return u, c
+
+    # gather per-agent actions into an (n_agents, width) array
+    def pack(self, action_n):
+        if isinstance(action_n, np.ndarray) and action_n.ndim == 2:
+            return action_n
+        rows = self.rows
+        for i, action in enumerate(action_n):
+            action = self.pack_row(action, i)
+            rows[i, :len(action)] = action
+        return rows
+
+    # (..., n_agents, width) rows to (..., n_agents, dim_p) physical and
+    # (..., n_agents, dim_c) communication actions
+    def decode(self, rows):
+        rows = np.asarray(rows, dtype=float)
+        if rows.shape[-1] < self.width:
+            pad = [(0, 0)] * (rows.ndim - 1) + [(0, self.width - rows.shape[-1])]
+            rows = np.pad(rows, pad)
+        if self.discrete_input:
+            u = self.moves[np.where(self.movable, rows[..., 0], 0).astype(int)]
+            c = self.comms[np.where(self.silent, 0, rows[..., self.agent_index, self.c_index][..., 0]).astype(int)]
+        else:
+            u = rows[..., :self.u_size]
+            if self.force_discrete:
+                u = np.eye(self.u_size)[np.argmax(u, axis=-1)]
+            if self.discrete_space:
+                u = u[..., 1::2] - u[..., 2::2]
+            c = rows[..., self.agent_index, self.c_index]
+        u = np.where(self.movable[:, None], u * self.sensitivity, 0.0)
+        c = np.where(self.silent[:, None], 0.0, c)
+        return u, c
+
+
 # vectorized wrapper for a batch of multi-agent environments
 # assumes all environments have the same observation and action space
+# (steps them one after another; see multiagent.vec_env for a multi-process version)
 class BatchMultiAgentEnv(gym.Env):
     metadata = {
         'runtime.vectorized': True,
@@ -324,14 +584,15 @@ class BatchMultiAgentEnv(gym.Env):
     def observation_space(self):
         return self.env_batch[0].observation_space
 
-    def step(self, action_n, time):
+    # time is accepted for backwards compatibility and ignored
+    def step(self, action_n, time=None):
         obs_n = []
         reward_n = []
         done_n = []
         info_n = {'n': []}
         i = 0
         for env in self.env_batch:
-            obs, reward, done, _ = env.step(action_n[i:(i+env.n)], time)
+            obs, reward, done, _ = env.step(action_n[i:(i+env.n)])
             i += env.n
             obs_n += obs
             # reward = [r / len(self.env_batch) for r in reward]
@@ -339,6 +600,11 @@ class BatchMultiAgentEnv(gym.Env):
             done_n += done
         return obs_n, reward_n, done_n, info_n
 
+    # give every environment an independent random stream derived from seed
+    def seed(self, seed=None):
+        for env, env_seed in zip(self.env_batch, np.random.SeedSequence(seed).spawn(len(self.env_batch))):
+            env.seed(env_seed)
+
     def reset(self):
         obs_n = []
         for env in self.env_batch:
@@ -349,5 +615,5 @@ class BatchMultiAgentEnv(gym.Env):
     def render(self, mode='human', close=True):
         results_n = []
         for env in self.env_batch:
-            results_n += env.render(mode, close)
+            results_n += env.render(mode)
         return results_n
@@ -0,0 +1,147 @@
+import json
+import math
+import sys
+import time
+
+
+# methods timed on a World and on a MultiAgentEnv, with their phase names
+WORLD_PHASES = [
+    ('step', 'world_step'),
+    ('apply_scripted_actions', 'scripted_agents'),
+    ('apply_action_force', 'action_force'),
+    ('apply_environment_force', 'contact_force'),
+    ('apply_wall_contact_force', 'wall_force'),
+    ('integrate_state', 'integrate'),
+    ('update_agent_state', 'agent_state'),
+]
+ENV_PHASES = [
+    ('step', 'env_step'),
+    ('_set_actions', 'set_action'),
+    ('_get_obs', 'observation'),
+    ('_get_reward', 'reward'),
+    ('_get_rewards', 'rewards'),
+    ('_get_done', 'done'),
+    ('_get_info', 'info'),
+    ('reset_callback', 'reset'),
+    ('render', 'render'),
+]
+
+# latency histograms have one bin per power of two microseconds: bin 0 holds
+# calls under 0.5us, bin k calls in [2**(k-1), 2**k) us and the last bin the rest
+N_BINS = 28
+
+
+# per-phase wall time, call counts and latency histograms of a world and/or
+# environment. Attaching wraps the timed methods on the instances themselves,
+# so nothing is measured (or slowed down) once detached. Phase times include
+# the phases nested in them (e.g. world_step includes contact_force).
+# If dump_every is set, a report is written to stream every dump_every steps.
+class Profiler(object):
+    def __init__(self, dump_every=None, stream=None):
+        self.dump_every = dump_every
+        self.stream = sys.stderr if stream is None else stream
+        self.attached = []
+        self.reset()
+
+    # clear all statistics
+    def reset(self):
+        self.calls = {}
+        self.total = {}
+        self.max = {}
+        self.histogram = {}
+        self.steps = 0
+
+    def record(self, name, elapsed):
+        if name not in self.calls:
+            self.calls[name] = 0
+            self.total[name] = 0.0
+            self.max[name] = 0.0
+            self.histogram[name] = [0] * N_BINS
+        self.calls[name] += 1
+        self.total[name] += elapsed
+        if elapsed > self.max[name]:
+            self.max[name] = elapsed
+        self.histogram[name][min(max(math.frexp(elapsed * 1e6)[1], 0), N_BINS - 1)] += 1
+
+    # count a completed step and dump the report when due
+    def tick(self):
+        self.steps += 1
+        if self.dump_every and self.steps % self.dump_every == 0:
+            self.stream.write(self.report() + '\n')
+            self.stream.flush()
+
+    # timed version of func recorded under name
+    def wrap(self, name, func, tick=False):
+        clock = time.perf_counter
+        record = self.record
+
+        def timed(*args, **kwargs):
+            start = clock()
+            result = func(*args, **kwargs)
+            record(name, clock() - start)
+            if tick:
+                self.tick()
+            return result
+        return timed
+
+    # time the given (attribute, phase name) methods of obj
+    def attach(self, obj, phases, tick_on=None):
+        for attr, name in phases:
+            func = getattr(obj, attr, None)
+            if func is None:
+                continue
+            # remember whether the instance had its own attribute (e.g. a callback)
+            self.attached.append((obj, attr, obj.__dict__.get(attr, None), attr in obj.__dict__))
+            setattr(obj, attr, self.wrap(name, func, tick=attr == tick_on))
+
+    def attach_world(self, world, tick=True):
+        self.attach(world, WORLD_PHASES, tick_on='step' if tick else None)
+
+    # time an environment and its world; steps are counted by env.step
+    def attach_env(self, env):
+        self.attach(env, ENV_PHASES, tick_on='step')
+        self.attach_world(env.world, tick=False)
+
+    # restore the original methods
+    def detach(self):
+        for obj, attr, value, owned in reversed(self.attached):
+            if owned:
+                setattr(obj, attr, value)
+            else:
+                delattr(obj, attr)
+        self.attached = []
+
+    # latency (in seconds) below which the given fraction of calls fall,
+    # estimated as the upper edge of the histogram bin
+    def percentile(self, name, q):
+        histogram = self.histogram[name]
+        target = q * self.calls[name]
+        count = 0
+        for k, n in enumerate(histogram):
+            count += n
+            if count >= target:
+                return min(2.0 ** k * 1e-6, self.max[name])
+        return self.max[name]
+
+    # aggregated statistics per phase
+    def stats(self):
+        return {name: {'calls': self.calls[name],
+                       'total': self.total[name],
+                       'mean': self.total[name] / self.calls[name],
+                       'max': self.max[name],
+                       'p50': self.percentile(name, 0.5),
+                       'p99': self.percentile(name, 0.99),
+                       'histogram': list(self.histogram[name])}
+                for name in self.calls}
+
+    def dump_json(self, f):
+        json.dump({'steps': self.steps, 'phases': self.stats()}, f)
+
+    # table of phases sorted by total time
+    def report(self):
+        lines = ['%d steps' % self.steps,
+                 '%-16s %10s %12s %10s %10s %10s %10s' % ('phase', 'calls', 'total ms', 'mean us', 'p50 us', 'p99 us', 'max us')]
+        for name, s in sorted(self.stats().items(), key=lambda item: -item[1]['total']):
+            lines.append('%-16s %10d %12.2f %10.2f %10.2f %10.2f %10.2f' % (
+                name, s['calls'], s['total'] * 1e3, s['mean'] * 1e6, s['p50'] * 1e6, s['p99'] * 1e6, s['max'] * 1e6))
+        return '\n'.join(lines)
@@ -247,6 +247,16 @@ class FilledPolygon(Geom):
                 glVertex3f(p[0], p[1],0)  # draw each vertex
             glEnd()
 
+# many quadrilaterals, given as a (Q, 4, 2) array of corners, drawn in one call
+class FilledQuads(Geom):
+    def __init__(self, quads):
+        Geom.__init__(self)
+        quads = np.asarray(quads, dtype=float)
+        self.vertices = pyglet.graphics.vertex_list(4 * len(quads), ('v2f', tuple(quads.ravel())))
+
+    def render1(self):
+        self.vertices.draw(GL_QUADS)
+
 def make_circle(radius=10, res=30, filled=True):
     points = []
     for i in range(res):
@@ -261,6 +271,9 @@ def make_polygon(v, filled=True):
     if filled: return FilledPolygon(v)
     else: return PolyLine(v, True)
 
+def make_quads(quads):
+    return FilledQuads(quads)
+
 def make_polyline(v):
     return PolyLine(v, False)
 
@@ -8,3 +8,12 @@ class BaseScenario(object):
     # create initial conditions of the world
     def reset_world(self, world):
         raise NotImplementedError()
+
+
+# optional scenario methods passed on to MultiAgentEnv as callbacks
+def scenario_hooks(scenario):
+    return dict(global_reward_callback=getattr(scenario, 'global_reward', None),
+                rewards_callback=getattr(scenario, 'rewards', None),
+                batch_reward_callback=getattr(scenario, 'batch_reward', None),
+                observation_into_callback=getattr(scenario, 'observation_into', None),
+                observation_layout_callback=getattr(scenario, 'observation_layout', None))
@@ -1,5 +1,5 @@
 import numpy as np
-from multiagent.core import World, Agent, Landmark, Goal
+from multiagent.core import World, Agent, Landmark, Goal, BOX, TARGET
 from multiagent.scenario import BaseScenario
 
 
@@ -59,7 +59,7 @@ class Scenario(BaseScenario):
             else:
                 raise NotImplementedError()
 
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
 
@@ -68,11 +68,11 @@ class Scenario(BaseScenario):
             landmark.color = np.array([0.25, 0.25, 0.25])
             landmark.state.p_vel = np.zeros(world.dim_p)
 
-            if "box" in landmark.name and landmark.index == 0:
+            if landmark.role == BOX and landmark.index == 0:
                 landmark.state.p_pos = np.array([-0.25, 0.0])
-            elif "target" in landmark.name and landmark.index == 0:
+            elif landmark.role == TARGET and landmark.index == 0:
                 landmark.state.p_pos = np.array([-0.85, 0.0])
-            elif "target" in landmark.name and landmark.index == 1:
+            elif landmark.role == TARGET and landmark.index == 1:
                 landmark.state.p_pos = np.array([+0.85, 0.0])
             else:
                 raise ValueError()
@@ -84,21 +84,25 @@ class Scenario(BaseScenario):
             goal.state.p_vel = np.zeros(world.dim_p)
 
     def reward(self, agent, world):
-        for i, landmark in enumerate(world.landmarks):
-            if "box" in landmark.name and landmark.index == 0:
-                box0 = landmark
-            elif "target" in landmark.name and landmark.index == 0:
-                target0 = landmark
-            elif "target" in landmark.name and landmark.index == 1:
-                target1 = landmark
-            else:
-                raise ValueError()
+        return self.global_reward(world)
+
+    # the same for every agent, so the env evaluates it once per step
+    def global_reward(self, world):
+        box0 = world.entity_by_name['box 0']
+        target0 = world.entity_by_name['target 0']
 
         # Move box0 to target0 (One Box)
         dist = np.sum(np.square(box0.state.p_pos - target0.state.p_pos))
 
         return -dist
 
+    # reward of every world in a BatchWorld, as (B, n_agents)
+    def batch_reward(self, world, batch):
+        box0 = batch.p_pos[:, world.entities.index(self.boxes[0])]
+        target0 = batch.p_pos[:, world.entities.index(self.targets[0])]
+        dist = np.sum(np.square(box0 - target0), axis=-1)
+        return np.repeat(-dist[:, None], batch.n_agents, axis=1)
+
     def observation(self, agent, world):
         # get positions of all entities
         entity_pos = []
@@ -114,3 +118,25 @@ class Scenario(BaseScenario):
             other_pos.append(other.state.p_pos)
 
         return np.concatenate([agent.state.p_vel] + [agent.state.p_pos] + entity_pos + other_pos)
+
+    # segments of the observation as (name, size)
+    def observation_layout(self, agent, world):
+        return [('p_vel', world.dim_p), ('p_pos', world.dim_p),
+                ('landmark_pos', len(world.landmarks) * world.dim_p),
+                ('other_pos', (len(world.agents) - 1) * world.dim_p)]
+
+    # same observation as above, written into the contiguous array out
+    def observation_into(self, agent, world, out):
+        dim_p = world.dim_p
+        out[:dim_p] = agent.state.p_vel
+        out[dim_p:2 * dim_p] = agent.state.p_pos
+        i = 2 * dim_p
+        for entity in world.landmarks:
+            out[i:i + dim_p] = entity.state.p_pos
+            i += dim_p
+        for other in world.agents:
+            if other is agent:
+                continue
+            out[i:i + dim_p] = other.state.p_pos
+            i += dim_p
+        return out
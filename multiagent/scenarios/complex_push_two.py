@@ -1,5 +1,5 @@
 import numpy as np
-from multiagent.core import World, Agent, Landmark, Goal
+from multiagent.core import World, Agent, Landmark, Goal, BOX, TARGET
 from multiagent.scenario import BaseScenario
 
 
@@ -73,7 +73,7 @@ class Scenario(BaseScenario):
             else:
                 raise NotImplementedError()
 
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
 
@@ -82,13 +82,13 @@ class Scenario(BaseScenario):
             landmark.color = np.array([0.25, 0.25, 0.25])
             landmark.state.p_vel = np.zeros(world.dim_p)
 
-            if "box" in landmark.name and landmark.index == 0:
+            if landmark.role == BOX and landmark.index == 0:
                 landmark.state.p_pos = np.array([-0.30, 0.0])
-            elif "box" in landmark.name and landmark.index == 1:
+            elif landmark.role == BOX and landmark.index == 1:
                 landmark.state.p_pos = np.array([0.30, 0.0])
-            elif "target" in landmark.name and landmark.index == 0:
+            elif landmark.role == TARGET and landmark.index == 0:
                 landmark.state.p_pos = np.array([-0.85, 0.0])
-            elif "target" in landmark.name and landmark.index == 1:
+            elif landmark.role == TARGET and landmark.index == 1:
                 landmark.state.p_pos = np.array([+0.85, 0.0])
             else:
                 raise ValueError()
@@ -100,17 +100,14 @@ class Scenario(BaseScenario):
             goal.state.p_vel = np.zeros(world.dim_p)
 
     def reward(self, agent, world):
-        for i, landmark in enumerate(world.landmarks):
-            if "box" in landmark.name and landmark.index == 0:
-                box0 = landmark
-            elif "box" in landmark.name and landmark.index == 1:
-                box1 = landmark
-            elif "target" in landmark.name and landmark.index == 0:
-                target0 = landmark
-            elif "target" in landmark.name and landmark.index == 1:
-                target1 = landmark
-            else:
-                raise ValueError()
+        return self.global_reward(world)
+
+    # the same for every agent, so the env evaluates it once per step
+    def global_reward(self, world):
+        box0 = world.entity_by_name['box 0']
+        box1 = world.entity_by_name['box 1']
+        target0 = world.entity_by_name['target 0']
+        target1 = world.entity_by_name['target 1']
 
         dist1 = np.sum(np.square(box0.state.p_pos - target0.state.p_pos))
         dist2 = np.sum(np.square(box1.state.p_pos - target1.state.p_pos))
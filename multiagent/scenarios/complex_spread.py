@@ -48,16 +48,20 @@ class Scenario(BaseScenario):
 
         # make initial conditions
         self.reset_world(world)
+
+        # target assignment and oracle are part of the dynamic state
+        world.dynamic_attributes = [(agent, 'i_target_landmark') for agent in world.agents]
+        world.dynamic_attributes.append((world.landmarks[2], 'oracle_on'))
         return world
 
     def reset_world(self, world):
         for i, agent in enumerate(world.agents):
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
 
             if i == 0:
-                agent.i_target_landmark = np.random.choice(2)
+                agent.i_target_landmark = world.np_random.choice(2)
                 agent.color = np.array([1.0, 0.0, 0.0])
                 world.landmarks[agent.i_target_landmark].color = \
                     np.array([1.0, 0.0, 0.0])
@@ -71,7 +75,7 @@ class Scenario(BaseScenario):
                 raise ValueError()
 
         for i, landmark in enumerate(world.landmarks):
-            landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             landmark.state.p_vel = np.zeros(world.dim_p)
 
             if i == 2:
@@ -80,7 +84,7 @@ class Scenario(BaseScenario):
 
         while self.check_landmark_dist(world, th=1.5) is False:
             for i, landmark in enumerate(world.landmarks):
-                landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+                landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
                 landmark.state.p_vel = np.zeros(world.dim_p)
 
         for i, goal in enumerate(world.goals):
@@ -68,7 +68,7 @@ class Scenario(BaseScenario):
 
         # set random initial states
         for agent in world.agents:
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
         # world.agents[0].state.p_pos = np.array([-0.1, 0.0])
@@ -76,12 +76,12 @@ class Scenario(BaseScenario):
 
         # For landmark, we make sure that their distance is at least some size
         for i, landmark in enumerate(world.landmarks):
-            landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             landmark.state.p_vel = np.zeros(world.dim_p)
 
         while self.check_landmark_dist(world, agent.size * 2) is False:
             for i, landmark in enumerate(world.landmarks):
-                landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+                landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
                 landmark.state.p_vel = np.zeros(world.dim_p)
         
         # world.landmarks[0].state.p_pos = np.array([-0.8, 0.0])
@@ -109,10 +109,10 @@ class Scenario(BaseScenario):
         collisions = 0
         occupied_landmarks = 0
         min_dists = 0
-        for l in world.landmarks:
-            dists = [np.sqrt(np.sum(np.square(a.state.p_pos - l.state.p_pos))) for a in world.agents]
-            min_dists += min(dists)
-            if min(dists) < agent.size:
+        dists = world.contacts.distances_between(world.agents, world.landmarks)
+        for min_dist in np.min(dists, axis=0):
+            min_dists += min_dist
+            if min_dist < agent.size:
                 occupied_landmarks += 1
         if occupied_landmarks == len(world.landmarks):
             rew = 1
@@ -120,23 +120,27 @@ class Scenario(BaseScenario):
             rew = -0.01
         if agent.collide:
             for a in world.agents:
-                if self.is_collision(a, agent):
+                if self.is_collision(a, agent, world):
                     collisions += 1
         return (rew, collisions, min_dists, occupied_landmarks)
 
-    def is_collision(self, agent1, agent2):
+    # with the world, the overlap is read from its shared contact matrix
+    def is_collision(self, agent1, agent2, world=None):
+        if world is not None:
+            return world.contacts.overlap(agent1, agent2)
         delta_pos = agent1.state.p_pos - agent2.state.p_pos
         dist = np.sqrt(np.sum(np.square(delta_pos)))
         dist_min = agent1.size + agent2.size
         return True if dist < dist_min else False
 
     def reward(self, agent, world):
+        return self.global_reward(world)
+
+    # the same for every agent, so the env evaluates it once per step
+    def global_reward(self, world):
         # Agents are rewarded based on whether or not all landmarks are reached
-        occupied_landmarks = 0
-        for l in world.landmarks:
-            dists = [np.sqrt(np.sum(np.square(a.state.p_pos - l.state.p_pos))) for a in world.agents]
-            if min(dists) < agent.size:
-                occupied_landmarks += 1
+        dists = world.contacts.distances_between(world.agents, world.landmarks)
+        occupied_landmarks = np.sum(np.min(dists, axis=0) < world.agents[0].size)
         if occupied_landmarks == len(world.landmarks):
             return 1.
         else:
@@ -165,11 +169,8 @@ class Scenario(BaseScenario):
         done_flag = False
 
         # Check whether all landmarks are occupied
-        occupied_landmarks = 0
-        for l in world.landmarks:
-            dists = [np.sqrt(np.sum(np.square(a.state.p_pos - l.state.p_pos))) for a in world.agents]
-            if min(dists) < agent.size:
-                occupied_landmarks += 1
+        dists = world.contacts.distances_between(world.agents, world.landmarks)
+        occupied_landmarks = np.sum(np.min(dists, axis=0) < agent.size)
         if occupied_landmarks == len(world.landmarks):
             done_flag = True
 
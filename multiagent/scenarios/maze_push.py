@@ -4,14 +4,17 @@ from multiagent.scenario import BaseScenario
 
 
 class Scenario(BaseScenario):
-    def make_world(self, mode):
+    def make_world(self, mode, static_walls=False):
         """
         - mode0: Pretrain from room2 to room1
         - mode1: Pretrain from room1 to target
         - mode2: Train from room2 to target
+        static_walls: build the center wall as one static box (world.walls)
+        instead of a row of border entities
         """
         world = World()
         self.mode = mode
+        self.static_walls = static_walls
 
         # add agents
         world.agents = [Agent() for i in range(2)]
@@ -65,6 +68,13 @@ class Scenario(BaseScenario):
         n_border = round(self.length / offset)
         center_border = [Border() for _ in range(n_border)]
 
+        if self.static_walls:
+            # the same wall as the row of border blocks below
+            world.walls.add_box([-offset / 2., -1.], [offset / 2., -1. + n_border * offset])
+            world.walls.color = np.array([0.25, 0.25, 0.25])
+            center_border = []
+            half_width = offset / 2.
+
         # Add the center border
         x, y = 0, -1 + (offset / 2.)
         for border in center_border:
@@ -83,14 +93,15 @@ class Scenario(BaseScenario):
             world.borders.append(border)
 
             x, y = x, y + offset
+            half_width = border.size
 
         # Define room1 and room2
         self.x_room1_from = -1.
-        self.x_room1_to = 0. - border.size
+        self.x_room1_to = 0. - half_width
         self.y_room1_from = -1.
         self.y_room1_to = +1.
 
-        self.x_room2_from = 0. + border.size
+        self.x_room2_from = 0. + half_width
         self.x_room2_to = 1.
         self.y_room2_from = -1.
         self.y_room2_to = +1.
@@ -106,10 +117,10 @@ class Scenario(BaseScenario):
             agent.state.c = np.zeros(world.dim_c)
 
             agent.state.p_pos = np.zeros(world.dim_p)
-            agent.state.p_pos[0] = np.random.uniform(
+            agent.state.p_pos[0] = world.np_random.uniform(
                 low=self.x_room2_from + agent.size * 1.5,
                 high=self.x_room2_to - agent.size * 1.5)
-            agent.state.p_pos[1] = np.random.uniform(
+            agent.state.p_pos[1] = world.np_random.uniform(
                 low=self.y_room2_from + agent.size * 1.5,
                 high=self.y_room2_to - agent.size * 1.5)
 
@@ -131,6 +142,10 @@ class Scenario(BaseScenario):
             goal.state.p_vel = np.zeros(world.dim_p)
 
     def reward(self, agent, world):
+        return self.global_reward(world)
+
+    # the same for every agent, so the env evaluates it once per step
+    def global_reward(self, world):
         # Inside Room 1
         if self.box.state.p_pos[0] < 0.:
             dist = np.sum(np.square(self.box.state.p_pos - self.target.state.p_pos))
@@ -145,6 +160,15 @@ class Scenario(BaseScenario):
 
         return -dist / 10.  # Reward scale
 
+    # reward of every world in a BatchWorld, as (B, n_agents)
+    def batch_reward(self, world, batch):
+        box = batch.p_pos[:, world.entities.index(self.box)]
+        target = batch.p_pos[:, world.entities.index(self.target)]
+        room1_dist = np.sum(np.square(np.array([0., 1.]) - target), axis=-1)
+        room2_dist = np.sum(np.square(self.boundary_pos - box), axis=-1)
+        dist = np.where(box[:, 0] < 0., np.sum(np.square(box - target), axis=-1), room1_dist + room2_dist)
+        return np.repeat(-dist[:, None] / 10., batch.n_agents, axis=1)
+
     def observation(self, agent, world):
         # get positions of all entities
         entity_pos = []
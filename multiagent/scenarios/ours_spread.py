@@ -1,5 +1,5 @@
 import numpy as np
-from multiagent.core import World, Agent, Landmark
+from multiagent.core import World, Agent, Landmark, squared_norm
 from multiagent.scenario import BaseScenario
 
 
@@ -60,9 +60,9 @@ class Scenario(BaseScenario):
 
         for i, agent in enumerate(world.agents):
             if self.mode == 0:
-                agent.state.p_pos = world.landmarks[i].state.p_pos + np.random.uniform(-0.25, +0.25, world.dim_p)
+                agent.state.p_pos = world.landmarks[i].state.p_pos + world.np_random.uniform(-0.25, +0.25, world.dim_p)
             elif self.mode == 1:
-                agent.state.p_pos = world.landmarks[1 - i].state.p_pos + np.random.uniform(-0.25, +0.25, world.dim_p)
+                agent.state.p_pos = world.landmarks[1 - i].state.p_pos + world.np_random.uniform(-0.25, +0.25, world.dim_p)
             else:
                 raise ValueError()
 
@@ -70,6 +70,10 @@ class Scenario(BaseScenario):
             agent.state.c = np.zeros(world.dim_c)
 
     def reward(self, agent, world):
+        return self.global_reward(world)
+
+    # the same for every agent, so the env evaluates it once per step
+    def global_reward(self, world):
         rew = 0
         for l in world.landmarks:
             dists = [np.sqrt(np.sum(np.square(a.state.p_pos - l.state.p_pos))) for a in world.agents]
@@ -91,3 +95,38 @@ class Scenario(BaseScenario):
             other_pos.append(other.state.p_pos - agent.state.p_pos)
 
         return np.concatenate([agent.state.p_vel] + [agent.state.p_pos] + entity_pos + other_pos)
+
+    # batched versions of reset_world, reward and observation for the entries of a
+    # BatchWorld (entities are ordered agents, then landmarks)
+    def batch_reset(self, world, batch, index):
+        n = len(world.agents)
+        landmarks = np.array([[-0.75, 0.], [+0.75, 0.]])
+        if self.mode == 0:
+            start = landmarks
+        elif self.mode == 1:
+            start = landmarks[::-1]
+        else:
+            raise ValueError()
+        batch.p_pos[index, n:n + 2] = landmarks
+        batch.p_pos[index, :n] = start + batch.np_random.uniform(-0.25, +0.25, (len(index), n, world.dim_p))
+        batch.p_vel[index] = 0.0
+        batch.c[index] = 0.0
+
+    def batch_reward(self, world, batch):
+        n = len(world.agents)
+        pos = batch.p_pos[:, :n]
+        landmarks = batch.p_pos[:, n:n + len(world.landmarks)]
+        dists = np.sqrt(squared_norm(pos[:, :, None] - landmarks[:, None]))
+        rew = -np.sum(np.min(dists, axis=1), axis=-1)
+        return np.repeat(rew[:, None], n, axis=1)
+
+    def batch_observation(self, world, batch, out):
+        n, n_landmarks = len(world.agents), len(world.landmarks)
+        pos = batch.p_pos[:, :n]
+        others = np.array([[j for j in range(n) if j != i] for i in range(n)], dtype=int).reshape(n, n - 1)
+        landmarks = batch.p_pos[:, None, n:n + n_landmarks] - pos[:, :, None]
+        other_pos = pos[:, others] - pos[:, :, None]
+        out[...] = np.concatenate([batch.p_vel[:, :n], pos,
+                                   landmarks.reshape(batch.batch_size, n, -1),
+                                   other_pos.reshape(batch.batch_size, n, -1)], axis=-1)
+        return out
@@ -1,5 +1,5 @@
 import numpy as np
-from multiagent.core import World, Agent, Landmark, Goal
+from multiagent.core import World, Agent, Landmark, Goal, squared_norm
 from multiagent.scenario import BaseScenario
 
 
@@ -39,15 +39,15 @@ class Scenario(BaseScenario):
         world.landmarks[0].color = np.array([0.75, 0.25, 0.25])
         # set random initial states
         for agent in world.agents:
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
         for i, landmark in enumerate(world.landmarks):
-            landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             # dk: Check the distance between agent and landmark are initialized
             # at least x distance
             while self.check_distance(world.agents, landmark.state.p_pos):
-                landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+                landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             landmark.state.p_vel = np.zeros(world.dim_p)
         for i, goal in enumerate(world.goals):
             goal.state.p_pos = np.zeros(world.dim_p) - 2  # NOTE Initialize outside of the box
@@ -75,3 +75,23 @@ class Scenario(BaseScenario):
         for entity in world.landmarks:
             entity_pos.append(entity.state.p_pos - agent.state.p_pos)
         return np.concatenate([agent.state.p_vel] + entity_pos)
+
+    # batched versions of reset_world, reward and observation for the entries of a
+    # BatchWorld (entities are ordered agent, then landmark)
+    def batch_reset(self, world, batch, index):
+        index = np.asarray(index)
+        batch.p_vel[index] = 0.0
+        batch.c[index] = 0.0
+        batch.p_pos[index, 0] = batch.np_random.uniform(-1, +1, (len(index), world.dim_p))
+        # resample landmarks that are too close to the agent (see check_distance)
+        while len(index):
+            batch.p_pos[index, 1] = batch.np_random.uniform(-1, +1, (len(index), world.dim_p))
+            dist = np.linalg.norm(batch.p_pos[index, 0] - batch.p_pos[index, 1], axis=-1)
+            index = index[dist < 1.]
+
+    def batch_reward(self, world, batch):
+        return -squared_norm(batch.p_pos[:, :1] - batch.p_pos[:, 1:2])
+
+    def batch_observation(self, world, batch, out):
+        out[...] = np.concatenate([batch.p_vel[:, :1], batch.p_pos[:, 1:2] - batch.p_pos[:, :1]], axis=-1)
+        return out
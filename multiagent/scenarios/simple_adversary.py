@@ -41,17 +41,17 @@ class Scenario(BaseScenario):
         for i, landmark in enumerate(world.landmarks):
             landmark.color = np.array([0.15, 0.15, 0.15])
         # set goal landmark
-        goal = np.random.choice(world.landmarks)
+        goal = world.np_random.choice(world.landmarks)
         goal.color = np.array([0.15, 0.65, 0.15])
         for agent in world.agents:
             agent.goal_a = goal
         # set random initial states
         for agent in world.agents:
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
         for i, landmark in enumerate(world.landmarks):
-            landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             landmark.state.p_vel = np.zeros(world.dim_p)
 
     def benchmark_data(self, agent, world):
@@ -67,11 +67,11 @@ class Scenario(BaseScenario):
 
     # return all agents that are not adversaries
     def good_agents(self, world):
-        return [agent for agent in world.agents if not agent.adversary]
+        return world.memo('good_agents', lambda: [agent for agent in world.agents if not agent.adversary])
 
     # return all adversarial agents
     def adversaries(self, world):
-        return [agent for agent in world.agents if agent.adversary]
+        return world.memo('adversaries', lambda: [agent for agent in world.agents if agent.adversary])
 
     def reward(self, agent, world):
         # Agents are rewarded based on minimum agent distance to each landmark
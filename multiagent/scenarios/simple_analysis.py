@@ -58,7 +58,7 @@ class Scenario(BaseScenario):
             landmark.state.p_vel = np.zeros(world.dim_p)
 
         for i, agent in enumerate(world.agents):
-            agent.state.p_pos = world.landmarks[i].state.p_pos + np.random.uniform(-0.25, +0.25, world.dim_p)
+            agent.state.p_pos = world.landmarks[i].state.p_pos + world.np_random.uniform(-0.25, +0.25, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
 
@@ -66,17 +66,17 @@ class Scenario(BaseScenario):
         if self.analysis_mode == -1:
             pass
         elif self.analysis_mode == 0:
-            world.agents[0].state.p_pos = np.random.uniform(-1., +1., world.dim_p)
+            world.agents[0].state.p_pos = world.np_random.uniform(-1., +1., world.dim_p)
             world.agents[1].state.p_pos = np.array([+0.60, 0.0])
         elif self.analysis_mode == 1:
-            world.agents[0].state.p_pos = np.random.uniform(-1., +1., world.dim_p)
+            world.agents[0].state.p_pos = world.np_random.uniform(-1., +1., world.dim_p)
             world.agents[1].state.p_pos = np.array([-0.60, 0.0])
         elif self.analysis_mode == 2:
             world.agents[0].state.p_pos = np.array([+0.60, 0.0])
-            world.agents[1].state.p_pos = np.random.uniform(-1., +1., world.dim_p)
+            world.agents[1].state.p_pos = world.np_random.uniform(-1., +1., world.dim_p)
         elif self.analysis_mode == 3:
             world.agents[0].state.p_pos = np.array([-0.60, 0.0])
-            world.agents[1].state.p_pos = np.random.uniform(-1., +1., world.dim_p)
+            world.agents[1].state.p_pos = world.np_random.uniform(-1., +1., world.dim_p)
         else:
             raise ValueError()
 
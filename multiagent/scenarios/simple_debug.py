@@ -37,13 +37,13 @@ class Scenario(BaseScenario):
 
         # set random initial states
         for agent in world.agents:
-            # agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            # agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_pos = np.array([0., 0.])
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
 
         for i, landmark in enumerate(world.landmarks):
-            # landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            # landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             landmark.state.p_pos = np.array([0.75, 0.])
             landmark.state.p_vel = np.zeros(world.dim_p)
 
@@ -37,7 +37,7 @@ class Scenario(BaseScenario):
             landmark.color[i + 1] += 0.8
             landmark.index = i
         # set goal landmark
-        goal = np.random.choice(world.landmarks)
+        goal = world.np_random.choice(world.landmarks)
         for i, agent in enumerate(world.agents):
             agent.goal_a = goal
             agent.color = np.array([0.25, 0.25, 0.25])
@@ -48,11 +48,11 @@ class Scenario(BaseScenario):
                 agent.color[j + 1] += 0.5
         # set random initial states
         for agent in world.agents:
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
         for i, landmark in enumerate(world.landmarks):
-            landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             landmark.state.p_vel = np.zeros(world.dim_p)
 
     def reward(self, agent, world):
@@ -1,5 +1,5 @@
 import numpy as np
-from multiagent.core import World, Agent, Landmark
+from multiagent.core import World, Agent, Landmark, squared_norm
 from multiagent.scenario import BaseScenario
 
 
@@ -36,12 +36,13 @@ class Scenario(BaseScenario):
         for i, landmark in enumerate(world.landmarks):
             landmark.color = np.array([0.25, 0.25, 0.25])
         # set random initial states
-        for agent in world.agents:
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+        p_pos = world.np_random.uniform(-1, +1, (len(world.agents) + len(world.landmarks), world.dim_p))
+        for i, agent in enumerate(world.agents):
+            agent.state.p_pos = p_pos[i]
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
         for i, landmark in enumerate(world.landmarks):
-            landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            landmark.state.p_pos = p_pos[len(world.agents) + i]
             landmark.state.p_vel = np.zeros(world.dim_p)
 
     def benchmark_data(self, agent, world):
@@ -49,20 +50,23 @@ class Scenario(BaseScenario):
         collisions = 0
         occupied_landmarks = 0
         min_dists = 0
-        for l in world.landmarks:
-            dists = [np.sqrt(np.sum(np.square(a.state.p_pos - l.state.p_pos))) for a in world.agents]
-            min_dists += min(dists)
-            rew -= min(dists)
-            if min(dists) < 0.1:
+        dists = world.contacts.distances_between(world.agents, world.landmarks)
+        for min_dist in np.min(dists, axis=0):
+            min_dists += min_dist
+            rew -= min_dist
+            if min_dist < 0.1:
                 occupied_landmarks += 1
         if agent.collide:
             for a in world.agents:
-                if self.is_collision(a, agent):
+                if self.is_collision(a, agent, world):
                     rew -= 1
                     collisions += 1
         return (rew, collisions, min_dists, occupied_landmarks)
 
-    def is_collision(self, agent1, agent2):
+    # with the world, the overlap is read from its shared contact matrix
+    def is_collision(self, agent1, agent2, world=None):
+        if world is not None:
+            return world.contacts.overlap(agent1, agent2)
         delta_pos = agent1.state.p_pos - agent2.state.p_pos
         dist = np.sqrt(np.sum(np.square(delta_pos)))
         dist_min = agent1.size + agent2.size
@@ -70,16 +74,29 @@ class Scenario(BaseScenario):
 
     def reward(self, agent, world):
         # Agents are rewarded based on minimum agent distance to each landmark, penalized for collisions
-        rew = 0
-        for l in world.landmarks:
-            dists = [np.sqrt(np.sum(np.square(a.state.p_pos - l.state.p_pos))) for a in world.agents]
-            rew -= min(dists)
+        rew = world.memo('coverage', lambda: self.coverage(world))
         if agent.collide:
             for a in world.agents:
-                if self.is_collision(a, agent):
+                if self.is_collision(a, agent, world):
                     rew -= 1
         return rew
 
+    # negative sum over landmarks of the distance to the closest agent (shared
+    # by all agents)
+    def coverage(self, world):
+        rew = 0
+        dists = world.contacts.distances_between(world.agents, world.landmarks)
+        for min_dist in np.min(dists, axis=0):
+            rew -= min_dist
+        return rew
+
+    # rewards of all agents: the landmark term is shared, so it is computed once
+    def rewards(self, world):
+        rew = world.memo('coverage', lambda: self.coverage(world))
+        collide = np.array([agent.collide for agent in world.agents])
+        collisions = np.sum(world.contacts.overlaps_between(world.agents, world.agents), axis=0)
+        return rew - np.where(collide, collisions, 0)
+
     def observation(self, agent, world):
         # get positions of all entities in this agent's reference frame
         entity_pos = []
@@ -98,3 +115,72 @@ class Scenario(BaseScenario):
             comm.append(other.state.c)
             other_pos.append(other.state.p_pos - agent.state.p_pos)
         return np.concatenate([agent.state.p_vel] + [agent.state.p_pos] + entity_pos + other_pos + comm)
+
+    # segments of the observation as (name, size)
+    def observation_layout(self, agent, world):
+        n_other = len(world.agents) - 1
+        return [('p_vel', world.dim_p), ('p_pos', world.dim_p),
+                ('landmark_pos', len(world.landmarks) * world.dim_p),
+                ('other_pos', n_other * world.dim_p), ('comm', n_other * world.dim_c)]
+
+    # same observation as above, written into the contiguous array out
+    def observation_into(self, agent, world, out):
+        dim_p, dim_c = world.dim_p, world.dim_c
+        out[:dim_p] = agent.state.p_vel
+        out[dim_p:2 * dim_p] = agent.state.p_pos
+        i = 2 * dim_p
+        for entity in world.landmarks:
+            np.subtract(entity.state.p_pos, agent.state.p_pos, out=out[i:i + dim_p])
+            i += dim_p
+        for other in world.agents:
+            if other is agent:
+                continue
+            np.subtract(other.state.p_pos, agent.state.p_pos, out=out[i:i + dim_p])
+            i += dim_p
+        for other in world.agents:
+            if other is agent:
+                continue
+            out[i:i + dim_c] = other.state.c
+            i += dim_c
+        return out
+
+    # batched versions of reset_world, reward and observation for the entries of a
+    # BatchWorld (entities are ordered agents, then landmarks)
+    def batch_reset(self, world, batch, index):
+        n = len(world.agents) + len(world.landmarks)
+        batch.p_pos[index, :n] = batch.np_random.uniform(-1, +1, (len(index), n, world.dim_p))
+        batch.p_vel[index] = 0.0
+        batch.c[index] = 0.0
+
+    def batch_reward(self, world, batch):
+        n = len(world.agents)
+        pos = batch.p_pos[:, :n]
+        rew = np.zeros(batch.batch_size)
+        for l in range(n, n + len(world.landmarks)):
+            dists = np.sqrt(squared_norm(pos - batch.p_pos[:, l:l + 1]))
+            rew -= np.min(dists, axis=1)
+        # collisions (including each agent with itself, as in reward)
+        rew = np.repeat(rew[:, None], n, axis=1)
+        for a in range(n):
+            dists = np.sqrt(squared_norm(pos - pos[:, a:a + 1]))
+            rew -= (dists < batch.size[:n] + batch.size[a]) * batch.collide[:n]
+        return rew
+
+    def batch_observation(self, world, batch, out):
+        n, dim_p, dim_c = len(world.agents), world.dim_p, world.dim_c
+        pos = batch.p_pos[:, :n]
+        out[..., :dim_p] = batch.p_vel[:, :n]
+        out[..., dim_p:2 * dim_p] = pos
+        i = 2 * dim_p
+        for l in range(n, n + len(world.landmarks)):
+            np.subtract(batch.p_pos[:, l:l + 1], pos, out=out[..., i:i + dim_p])
+            i += dim_p
+        # the k-th other agent of agent a is k, or k + 1 from a onwards
+        others = np.arange(n - 1) + (np.arange(n - 1) >= np.arange(n)[:, None])
+        for k in range(n - 1):
+            np.subtract(np.take(pos, others[:, k], axis=1), pos, out=out[..., i:i + dim_p])
+            i += dim_p
+        for k in range(n - 1):
+            out[..., i:i + dim_c] = np.take(batch.c, others[:, k], axis=1)
+            i += dim_c
+        return out
@@ -62,18 +62,18 @@ class Scenario(BaseScenario):
                 raise NotImplementedError()
 
         for agent in world.agents:
-            # agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            # agent.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
         world.agents[0].state.p_pos = np.array([-0.25, 0.8])
         world.agents[1].state.p_pos = np.array([+0.25, 0.8])
 
         for i, landmark in enumerate(world.landmarks):
-            # landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+            # landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
             landmark.state.p_vel = np.zeros(world.dim_p)
         # while self.check_landmark_dist(world, th=agent.size * 2.5) is False:
         #     for i, landmark in enumerate(world.landmarks):
-        #         landmark.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+        #         landmark.state.p_pos = world.np_random.uniform(-1, +1, world.dim_p)
         #         landmark.state.p_vel = np.zeros(world.dim_p)
         world.landmarks[0].state.p_pos = np.array([-0.8, 0.0])
         world.landmarks[1].state.p_pos = np.array([+0.8, 0.0])
@@ -83,11 +83,15 @@ class Scenario(BaseScenario):
             goal.state.p_vel = np.zeros(world.dim_p)
 
     def reward(self, agent, world):
+        return self.global_reward(world)
+
+    # the same for every agent, so the env evaluates it once per step
+    def global_reward(self, world):
         # Agents are rewarded based on whether or not all landmarks are reached
         occupied_landmarks = 0
         for l in world.landmarks:
             dists = [np.sqrt(np.sum(np.square(a.state.p_pos - l.state.p_pos))) for a in world.agents]
-            if min(dists) < agent.size:
+            if min(dists) < world.agents[0].size:
                 occupied_landmarks += 1
 
         if occupied_landmarks == len(world.landmarks):
@@ -44,13 +44,15 @@ class Scenario(BaseScenario):
         for i, landmark in enumerate(world.landmarks):
             landmark.color = np.array([0.25, 0.25, 0.25])
         # set random initial states
-        for agent in world.agents:
-            agent.state.p_pos = np.random.uniform(-1, +1, world.dim_p)
+        agent_pos = world.np_random.uniform(-1, +1, (len(world.agents), world.dim_p))
+        landmark_pos = world.np_random.uniform(-0.9, +0.9, (len(world.landmarks), world.dim_p))
+        for i, agent in enumerate(world.agents):
+            agent.state.p_pos = agent_pos[i]
             agent.state.p_vel = np.zeros(world.dim_p)
             agent.state.c = np.zeros(world.dim_c)
         for i, landmark in enumerate(world.landmarks):
             if not landmark.boundary:
-                landmark.state.p_pos = np.random.uniform(-0.9, +0.9, world.dim_p)
+                landmark.state.p_pos = landmark_pos[i]
                 landmark.state.p_vel = np.zeros(world.dim_p)
 
 
@@ -59,14 +61,17 @@ class Scenario(BaseScenario):
         if agent.adversary:
             collisions = 0
             for a in self.good_agents(world):
-                if self.is_collision(a, agent):
+                if self.is_collision(a, agent, world):
                     collisions += 1
             return collisions
         else:
             return 0
 
 
-    def is_collision(self, agent1, agent2):
+    # with the world, the overlap is read from its shared contact matrix
+    def is_collision(self, agent1, agent2, world=None):
+        if world is not None:
+            return world.contacts.overlap(agent1, agent2)
         delta_pos = agent1.state.p_pos - agent2.state.p_pos
         dist = np.sqrt(np.sum(np.square(delta_pos)))
         dist_min = agent1.size + agent2.size
@@ -74,11 +79,11 @@ class Scenario(BaseScenario):
 
     # return all agents that are not adversaries
     def good_agents(self, world):
-        return [agent for agent in world.agents if not agent.adversary]
+        return world.memo('good_agents', lambda: [agent for agent in world.agents if not agent.adversary])
 
     # return all adversarial agents
     def adversaries(self, world):
-        return [agent for agent in world.agents if agent.adversary]
+        return world.memo('adversaries', lambda: [agent for agent in world.agents if agent.adversary])
 
 
     def reward(self, agent, world):
@@ -93,10 +98,10 @@ class Scenario(BaseScenario):
         adversaries = self.adversaries(world)
         if shape:  # reward can optionally be shaped (increased reward for increased distance from adversary)
             for adv in adversaries:
-                rew += 0.1 * np.sqrt(np.sum(np.square(agent.state.p_pos - adv.state.p_pos)))
+                rew += 0.1 * world.contacts.distance(agent, adv)
         if agent.collide:
             for a in adversaries:
-                if self.is_collision(a, agent):
+                if self.is_collision(a, agent, world):
                     rew -= 10
 
         # agents are penalized for exiting the screen, so that they can be caught by the adversaries
@@ -120,11 +125,11 @@ class Scenario(BaseScenario):
         adversaries = self.adversaries(world)
         if shape:  # reward can optionally be shaped (decreased reward for increased distance from agents)
             for adv in adversaries:
-                rew -= 0.1 * min([np.sqrt(np.sum(np.square(a.state.p_pos - adv.state.p_pos))) for a in agents])
+                rew -= 0.1 * min([world.contacts.distance(a, adv) for a in agents])
         if agent.collide:
             for ag in agents:
                 for adv in adversaries:
-                    if self.is_collision(ag, adv):
+                    if self.is_collision(ag, adv, world):
                         rew += 10
         return rew
 
@@ -145,3 +150,32 @@ class Scenario(BaseScenario):
             if not other.adversary:
                 other_vel.append(other.state.p_vel)
         return np.concatenate([agent.state.p_vel] + [agent.state.p_pos] + entity_pos + other_pos + other_vel)
+
+    # segments of the observation as (name, size)
+    def observation_layout(self, agent, world):
+        n_landmarks = len([entity for entity in world.landmarks if not entity.boundary])
+        n_other = len(world.agents) - 1
+        n_good = len([other for other in world.agents if other is not agent and not other.adversary])
+        return [('p_vel', world.dim_p), ('p_pos', world.dim_p),
+                ('landmark_pos', n_landmarks * world.dim_p),
+                ('other_pos', n_other * world.dim_p), ('other_vel', n_good * world.dim_p)]
+
+    # same observation as above, written into the contiguous array out
+    def observation_into(self, agent, world, out):
+        dim_p = world.dim_p
+        out[:dim_p] = agent.state.p_vel
+        out[dim_p:2 * dim_p] = agent.state.p_pos
+        i = 2 * dim_p
+        for entity in world.landmarks:
+            if not entity.boundary:
+                np.subtract(entity.state.p_pos, agent.state.p_pos, out=out[i:i + dim_p])
+                i += dim_p
+        for other in world.agents:
+            if other is agent: continue
+            np.subtract(other.state.p_pos, agent.state.p_pos, out=out[i:i + dim_p])
+            i += dim_p
+        for other in world.agents:
+            if other is agent or other.adversary: continue
+            out[i:i + dim_p] = other.state.p_vel
+            i += dim_p
+        return out
@@ -0,0 +1,94 @@
+import numpy as np
+from multiagent.core import World, Agent, Landmark, Border
+from multiagent.scenario import BaseScenario
+
+
+class Scenario(BaseScenario):
+    # synthetic world for scaling benchmarks: any number of colliding agents,
+    # movable and static landmarks and border blocks, spread over an arena that
+    # grows with the entity count so that the density stays the same.
+    # sleeping turns on sleeping bodies (see World.sleeping)
+    def make_world(self, num_agents=4, num_movable=4, num_static=4, num_borders=8, density=4.0, n_observed=8,
+                   sleeping=False):
+        world = World()
+        world.collaborative = True
+        world.sleeping = bool(sleeping)
+        self.n_observed = n_observed
+        num_entities = num_agents + num_movable + num_static + num_borders
+        # half width of the arena, for density entities per unit area
+        self.arena = max(1.0, 0.5 * np.sqrt(num_entities / density))
+
+        # add agents
+        world.agents = [Agent() for i in range(num_agents)]
+        for i, agent in enumerate(world.agents):
+            agent.name = 'agent %d' % i
+            agent.collide = True
+            agent.silent = True
+            agent.size = 0.05
+            agent.color = np.array([0.35, 0.35, 0.85])
+
+        # add movable and static landmarks
+        landmarks = [Landmark() for i in range(num_movable + num_static)]
+        for i, landmark in enumerate(landmarks):
+            landmark.name = 'landmark %d' % i
+            landmark.collide = True
+            landmark.movable = i < num_movable
+            landmark.size = 0.08
+            landmark.initial_mass = 2.
+            landmark.color = np.array([0.25, 0.25, 0.25]) if landmark.movable else np.array([0.75, 0.75, 0.75])
+        world.landmarks = landmarks
+
+        # add border blocks evenly around the arena
+        borders = [Border() for i in range(num_borders)]
+        perimeter = np.linspace(0, 4, num_borders, endpoint=False)
+        for t, border in zip(perimeter, borders):
+            border.name = 'border'
+            border.collide = True
+            border.movable = False
+            border.size = 0.05
+            border.shape = [
+                [-border.size, -border.size],
+                [border.size, -border.size],
+                [border.size, border.size],
+                [-border.size, border.size]]
+            border.color = np.array([0.25, 0.25, 0.25])
+            side, offset = int(t), 2 * (t - int(t)) - 1
+            corner = [[offset, -1], [1, offset], [-offset, 1], [-1, -offset]][side]
+            border.state.p_pos = np.array(corner) * self.arena
+            border.state.p_vel = np.zeros(world.dim_p)
+        world.borders = borders
+
+        # make initial conditions
+        self.reset_world(world)
+        return world
+
+    def reset_world(self, world):
+        # agents and landmarks are scattered over the arena
+        placed = list(world.agents) + list(world.landmarks)
+        p_pos = world.np_random.uniform(-self.arena, +self.arena, (len(placed), world.dim_p))
+        for entity, pos in zip(placed, p_pos):
+            entity.state.p_pos = pos
+            entity.state.p_vel = np.zeros(world.dim_p)
+        for agent in world.agents:
+            agent.state.c = np.zeros(world.dim_c)
+
+    def reward(self, agent, world):
+        # get close to the nearest landmark without bumping into other agents
+        if not world.landmarks:
+            return 0.0
+        rew = -np.min(world.contacts.distances_between([agent], world.landmarks))
+        for other in world.agents:
+            if other is not agent and world.contacts.overlap(agent, other):
+                rew -= 1
+        return rew
+
+    def observation(self, agent, world):
+        # own velocity and position, then the relative positions of the nearest
+        # other entities (padded with zeros in small worlds)
+        entities = world.entities
+        dists = world.contacts.distances_between([agent], entities)[0]
+        dists[world.agents.index(agent)] = np.inf
+        nearest = [entities[i] for i in np.argsort(dists)[:min(self.n_observed, len(entities) - 1)]]
+        entity_pos = [entity.state.p_pos - agent.state.p_pos for entity in nearest]
+        entity_pos += [np.zeros(world.dim_p)] * (self.n_observed - len(nearest))
+        return np.concatenate([agent.state.p_vel] + [agent.state.p_pos] + entity_pos)
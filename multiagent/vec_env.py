@@ -0,0 +1,346 @@
+import multiprocessing as mp
+from multiprocessing.connection import wait
+import numpy as np
+from multiagent.core import BatchWorld
+
+
+# numpy view of a shared buffer
+def shared_array(buffer, shape, dtype):
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+
+# step/reset loop of one environment in a worker process; actions are read from
+# and results written to this environment's rows of the shared buffers, while
+# the pipe only carries commands, infos and errors
+def worker(remote, parent_remote, env_fn, buffers, index, max_episode_len):
+    parent_remote.close()
+    env = env_fn()
+    env.array_output = True
+    obs, reward, done, action = [shared_array(*buffer)[index] for buffer in buffers]
+    while True:
+        cmd, data = remote.recv()
+        try:
+            if cmd == 'step':
+                ob, rew, dn, info = env.step(action)
+                reward[:] = rew
+                done[:] = dn
+                if max_episode_len is not None and env.time >= max_episode_len and not done.all():
+                    done[:] = True
+                    info['TimeLimit.truncated'] = True
+                if done.all():
+                    # start a new episode, keeping the last observation in info
+                    info['terminal_observation'] = ob.copy()
+                    ob = env.reset()
+                obs[:] = ob
+                remote.send(info)
+            elif cmd == 'reset':
+                obs[:] = env.reset()
+                reward[:] = 0.0
+                done[:] = False
+                remote.send(None)
+            elif cmd == 'seed':
+                env.seed(data)
+                remote.send(None)
+            elif cmd == 'call':
+                name, args = data
+                remote.send(getattr(env, name)(*args))
+            elif cmd == 'close':
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(cmd)
+        except Exception as e:
+            remote.send(e)
+
+
+# vectorized environment running K MultiAgentEnv instances in worker processes.
+# Actions, observations, rewards and dones are exchanged through shared (K, n, ...)
+# arrays, and episodes that end (all agents done, or max_episode_len steps) are
+# reset inside the worker with the last observation in info['terminal_observation'].
+# All environments must have the same agents and spaces.
+class SubprocMultiAgentEnv(object):
+    def __init__(self, env_fns, max_episode_len=None, context=None):
+        ctx = mp.get_context(context)
+        self.num_envs = len(env_fns)
+        # query the layout from one instance
+        env = env_fns[0]()
+        self.n = env.n
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+        self.obs_sizes = env.obs_sizes
+        self.obs_mask = env.obs_mask
+        self.action_decoder = env._get_action_decoder()
+        env.close()
+        # shared buffers
+        shapes = [((self.num_envs,) + self.obs_mask.shape, np.float64),
+                  ((self.num_envs, self.n), np.float64),
+                  ((self.num_envs, self.n), np.bool_),
+                  ((self.num_envs, self.n, self.action_decoder.width), np.float64)]
+        buffers = [(ctx.RawArray('b', int(np.prod(shape)) * np.dtype(dtype).itemsize), shape, dtype)
+                   for shape, dtype in shapes]
+        self.obs, self.reward, self.done, self.actions = [shared_array(*buffer) for buffer in buffers]
+        # workers
+        self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(self.num_envs)])
+        self.processes = []
+        for i, (remote, work_remote, env_fn) in enumerate(zip(self.remotes, work_remotes, env_fns)):
+            process = ctx.Process(target=worker, args=(work_remote, remote, env_fn, buffers, i, max_episode_len))
+            process.daemon = True
+            process.start()
+            work_remote.close()
+            self.processes.append(process)
+        self.waiting = False
+        self.closed = False
+
+    # write actions for all environments, as a (K, n, action_dim) array or K lists
+    # of per-agent actions; columns past a narrower array are zeroed, so that
+    # nothing is left over from earlier actions
+    def _write_actions(self, actions, env_ids):
+        if isinstance(actions, np.ndarray) and actions.ndim == 3:
+            width = actions.shape[-1]
+            self.actions[env_ids, :, :width] = actions
+            self.actions[env_ids, :, width:] = 0.0
+        else:
+            for i, action_n in zip(env_ids, actions):
+                self.actions[i] = self.action_decoder.pack(action_n)
+
+    def _recv(self, remote):
+        result = remote.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def step_async(self, actions):
+        self._write_actions(actions, np.arange(self.num_envs))
+        for remote in self.remotes:
+            remote.send(('step', None))
+        self.waiting = True
+
+    # (K, n, max obs size) observations, (K, n) rewards and dones, and K infos; the
+    # arrays are shared with the workers and overwritten by the next step
+    def step_wait(self):
+        infos = [self._recv(remote) for remote in self.remotes]
+        self.waiting = False
+        return self.obs, self.reward, self.done, infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(('reset', None))
+        for remote in self.remotes:
+            self._recv(remote)
+        return self.obs
+
+    # give every environment an independent random stream derived from seed
+    def seed(self, seed=None):
+        for remote, env_seed in zip(self.remotes, np.random.SeedSequence(seed).spawn(self.num_envs)):
+            remote.send(('seed', env_seed))
+        for remote in self.remotes:
+            self._recv(remote)
+
+    # call a method on every environment and return the results
+    def call(self, name, *args):
+        for remote in self.remotes:
+            remote.send(('call', (name, args)))
+        return [self._recv(remote) for remote in self.remotes]
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+
+# asynchronous pool of num_envs environments from which recv returns the first
+# batch_size to finish their step (or reset), with their ids; send then steps
+# only those environments, so slow steps and resets do not hold up the others
+class MultiAgentEnvPool(SubprocMultiAgentEnv):
+    def __init__(self, env_fns, batch_size=None, max_episode_len=None, context=None):
+        super(MultiAgentEnvPool, self).__init__(env_fns, max_episode_len=max_episode_len, context=context)
+        self.batch_size = self.num_envs if batch_size is None else batch_size
+        self.pending = set()
+        # finished (env id, info) not returned yet, in order of arrival
+        self.ready = []
+
+    # a pipe carries one request at a time, so environments can only be sent a
+    # new one once recv has collected the last
+    def _check_idle(self, env_ids):
+        env_ids = [int(i) for i in env_ids]
+        if len(set(env_ids)) < len(env_ids):
+            raise ValueError('duplicate environment ids %s' % env_ids)
+        busy = sorted(set(env_ids) & self.pending)
+        if busy:
+            raise ValueError('environments %s are already pending' % busy)
+        return env_ids
+
+    # send cmd to the given idle environments; results they finished but recv
+    # has not returned yet are dropped
+    def _send(self, cmd, env_ids):
+        env_ids = self._check_idle(env_ids)
+        self.ready = [(i, info) for i, info in self.ready if i not in env_ids]
+        for i in env_ids:
+            self.remotes[i].send((cmd, None))
+            self.pending.add(i)
+
+    # collect the results of the pending environments that have finished, or of
+    # all of them
+    def _collect(self, all_pending=False):
+        remotes = [self.remotes[i] for i in sorted(self.pending)]
+        for remote in remotes if all_pending else wait(remotes):
+            i = self.remotes.index(remote)
+            info = self._recv(remote)
+            self.pending.discard(i)
+            self.ready.append((i, {} if info is None else info))
+
+    # reset all environments that are not pending; their observations are
+    # returned by recv
+    def async_reset(self):
+        self._send('reset', [i for i in range(self.num_envs) if i not in self.pending])
+
+    # step the given environments with (len(env_ids), n, action_dim) actions
+    def send(self, actions, env_ids):
+        env_ids = np.asarray(self._check_idle(env_ids), dtype=int)
+        self._write_actions(actions, env_ids)
+        self._send('step', env_ids)
+
+    # observations, rewards, dones and infos of the first batch_size environments
+    # to finish, and their ids. The batch is shorter if fewer are pending
+    def recv(self):
+        while len(self.ready) < self.batch_size and self.pending:
+            self._collect()
+        if not self.ready:
+            raise RuntimeError('no environments are pending')
+        batch, self.ready = self.ready[:self.batch_size], self.ready[self.batch_size:]
+        env_ids = np.array([i for i, _ in batch], dtype=int)
+        infos = [info for _, info in batch]
+        return self.obs[env_ids], self.reward[env_ids], self.done[env_ids], infos, env_ids
+
+    # reset all environments, waiting for the pending ones first
+    def reset(self):
+        self._collect(all_pending=True)
+        self.ready = []
+        self.async_reset()
+        self._collect(all_pending=True)
+        self.ready = []
+        return self.obs
+
+    def close(self):
+        if self.closed:
+            return
+        for i in self.pending:
+            self.remotes[i].recv()
+        self.pending = set()
+        super(MultiAgentEnvPool, self).close()
+
+
+# vectorized environment of num_envs copies of one scenario, held in a single
+# BatchWorld and stepped together in this process (for small scenarios where
+# process workers spend most of their time on communication). Resets, observations
+# and dones use the scenario's batched callbacks when given and otherwise go
+# through the template env's world one entry at a time; rewards come from the
+# env's batch_reward_callback in the same way. Entries whose episode ends (all
+# agents done, or max_episode_len steps) are reset automatically.
+class BatchWorldEnv(object):
+    def __init__(self, env, num_envs, batch_reset_callback=None, batch_observation_callback=None,
+                 batch_done_callback=None, max_episode_len=None, seed=None):
+        self.env = env
+        self.world = env.world
+        self.num_envs = num_envs
+        self.n = env.n
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+        self.obs_sizes = env.obs_sizes
+        self.obs_mask = env.obs_mask
+        self.action_decoder = env._get_action_decoder()
+        # scenario callbacks
+        self.batch_reset_callback = batch_reset_callback
+        self.batch_observation_callback = batch_observation_callback
+        self.batch_done_callback = batch_done_callback
+        self.max_episode_len = max_episode_len
+        self.batch = BatchWorld(self.world, num_envs)
+        self.seed(seed)
+        # steps since the last reset of each entry
+        self.time = np.zeros(num_envs, dtype=int)
+        self.obs = np.zeros((num_envs,) + self.obs_mask.shape)
+
+    # seed the batch's random stream (noise and batched resets) and the
+    # template world's (resets through reset_callback)
+    def seed(self, seed=None):
+        batch_seed, world_seed = np.random.SeedSequence(seed).spawn(2)
+        self.batch.seed(batch_seed)
+        self.world.seed(world_seed)
+
+    # start new episodes in the given entries
+    def _reset(self, index):
+        if self.batch_reset_callback is not None:
+            self.batch_reset_callback(self.world, self.batch, index)
+        else:
+            for i in index:
+                self.env.reset_callback(self.world)
+                self.batch.load_world(self.world, i)
+        self.time[index] = 0
+
+    # observations of all entries, as (num_envs, n, max obs size); without a batched
+    # callback only the given entries are updated
+    def _get_obs(self, index):
+        if self.batch_observation_callback is not None:
+            self.batch_observation_callback(self.world, self.batch, self.obs)
+        else:
+            for b in index:
+                self.batch.store_world(self.world, b)
+                for i, agent in enumerate(self.env.agents):
+                    self.obs[b, i, :self.obs_sizes[i]] = self.env._get_obs(agent)
+        return self.obs
+
+    # (num_envs, n) dones, through the env's done_callback one entry at a time
+    # without a batched callback (all False without either)
+    def _get_done(self):
+        if self.batch_done_callback is not None:
+            return np.asarray(self.batch_done_callback(self.world, self.batch), dtype=bool)
+        done = np.zeros((self.num_envs, self.n), dtype=bool)
+        if self.env.done_callback is not None:
+            for b in range(self.num_envs):
+                self.batch.store_world(self.world, b)
+                for i, agent in enumerate(self.env.agents):
+                    done[b, i] = self.env._get_done(agent)
+        return done
+
+    def reset(self):
+        index = np.arange(self.num_envs)
+        self._reset(index)
+        return self._get_obs(index)
+
+    # step all entries with (num_envs, n, action_dim) actions. Returns
+    # (num_envs, n, max obs size) observations, (num_envs, n) rewards and dones,
+    # and an info dict of (num_envs,) masks: 'episode_done' for entries that were
+    # reset after this step (their last observations are in 'terminal_observation')
+    # and 'TimeLimit.truncated' for those that hit max_episode_len. The observation
+    # array is reused by the next step
+    def step(self, actions):
+        u, c = self.action_decoder.decode(actions)
+        self.batch.step(u, c)
+        self.time += 1
+        reward = self.env._get_batch_reward(self.batch)
+        done = self._get_done()
+        obs = self._get_obs(np.arange(self.num_envs))
+        episode_done = done.all(axis=1)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        if self.max_episode_len is not None:
+            truncated = (self.time >= self.max_episode_len) & ~episode_done
+            done[truncated] = True
+            episode_done |= truncated
+        info = {'episode_done': episode_done, 'TimeLimit.truncated': truncated}
+        if episode_done.any():
+            info['terminal_observation'] = obs.copy()
+            index = np.flatnonzero(episode_done)
+            self._reset(index)
+            obs = self._get_obs(index)
+        return obs, reward, done, info
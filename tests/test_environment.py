@@ -0,0 +1,29 @@
+import numpy as np
+
+from make_env import make_env
+from multiagent.benchmark import sample_action
+
+
+# agents with actions narrower than the widest one (simple_world_comm mixes
+# silent, movable-only and communicating agents) decode the same one row at a
+# time (in step and _set_action) as all at once from an array
+def test_heterogeneous_actions():
+    env = make_env('simple_world_comm')
+    env.seed(0)
+    env.reset()
+    rng = np.random.RandomState(0)
+    assert len({env._get_action_decoder().size[i] for i in range(env.n)}) > 1
+    for t in range(5):
+        action_n = [sample_action(space, rng) for space in env.action_space]
+        obs_n, reward_n, done_n, info_n = env.step(action_n)
+        assert len(obs_n) == env.n and np.all(np.isfinite(reward_n))
+        expected = [(agent.action.u.copy(), agent.action.c.copy()) for agent in env.agents]
+        decoder = env._get_action_decoder()
+        u, c = decoder.decode(decoder.pack(action_n))
+        assert all(np.array_equal(u[i], eu) and np.array_equal(c[i], ec) for i, (eu, ec) in enumerate(expected))
+        for agent, action, space, (u, c) in zip(env.agents, action_n, env.action_space, expected):
+            env._set_action(action, agent, space)
+            assert np.array_equal(agent.action.u, u)
+            assert np.array_equal(agent.action.c, c)
+    env._set_action(np.zeros(2), env.agents[1], env.action_space[1])
+    assert np.array_equal(env.agents[1].action.u, np.zeros(env.world.dim_p))
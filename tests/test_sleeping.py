@@ -0,0 +1,87 @@
+import numpy as np
+
+from multiagent.benchmark import make_benchmark_env, sample_action
+from multiagent.core import World, Agent, Landmark
+
+
+def rolling_ball_world(sleeping, p_vel):
+    world = World()
+    world.sleeping = sleeping
+    ball = Landmark()
+    ball.name = 'ball'
+    ball.movable = True
+    world.landmarks = [ball]
+    ball.state.p_pos = np.zeros(world.dim_p)
+    ball.state.p_vel = np.array(p_vel)
+    return world
+
+
+# a body falling asleep comes to rest within the documented distance of where
+# the regular physics stops it
+def test_sleeping_body_rest_position():
+    for p_vel in ([0.3, -0.2], [0.01, 0.0], [1e-4, 0.0]):
+        worlds = [rolling_ball_world(False, p_vel), rolling_ball_world(True, p_vel)]
+        for t in range(300):
+            for world in worlds:
+                world.step()
+        world = worlds[1]
+        assert world.state.asleep[0]
+        bound = world.sleep_velocity * world.dt * (1 - world.damping) / world.damping
+        assert np.abs(worlds[0].state.p_pos - world.state.p_pos).max() <= bound
+
+
+def pushed_block_world(sleeping):
+    world = World()
+    world.sleeping = sleeping
+    agent = Agent()
+    agent.name = 'agent'
+    agent.size = 0.05
+    agent.action.c = np.zeros(world.dim_c)
+    block = Landmark()
+    block.name = 'block'
+    block.movable = True
+    block.size = 0.1
+    wall = Landmark()
+    wall.name = 'wall'
+    wall.size = 0.1
+    world.agents = [agent]
+    world.landmarks = [block, wall]
+    # the block rests just short of contact with the wall
+    for entity, x in zip(world.entities, [-0.5, 0.0, 0.215]):
+        entity.state.p_pos = np.array([x, 0.0])
+        entity.state.p_vel = np.zeros(world.dim_p)
+    return world
+
+
+# a sleeping block woken by an agent pushing it into a wall gets the wall's
+# contact force on the step it wakes, as in the regular physics
+def test_woken_body_contacts():
+    worlds = [pushed_block_world(False), pushed_block_world(True)]
+    for t in range(300):
+        for world in worlds:
+            world.agents[0].action.u = np.array([1.0, 0.0]) if t > 60 else np.zeros(world.dim_p)
+            world.step()
+        if t == 60:
+            assert worlds[1].state.asleep[1]
+    assert not worlds[1].state.asleep[1]
+    assert np.abs(worlds[0].state.p_pos - worlds[1].state.p_pos).max() < 1e-6
+
+
+# the bound documented for crowded scenes: 100-entity stress worlds stay
+# within 1e-2 of the regular physics over 200 steps
+def test_stress_world_deviation():
+    world_args = dict(num_agents=25, num_movable=25, num_static=25, num_borders=25)
+    for seed in range(3):
+        trajectories = []
+        for sleeping in (False, True):
+            env = make_benchmark_env('stress', dict(world_args, sleeping=sleeping))
+            env.seed(seed)
+            env.reset()
+            rng = np.random.RandomState(seed)
+            positions = []
+            for t in range(200):
+                env.step([sample_action(space, rng) for space in env.action_space])
+                positions.append(env.world.state.p_pos.copy())
+            trajectories.append(np.array(positions))
+        assert env.world.state.asleep.any()
+        assert np.abs(trajectories[0] - trajectories[1]).max() < 1e-2